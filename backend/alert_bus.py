@@ -0,0 +1,53 @@
+import os
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Events buffered per subscriber before it is considered too slow and dropped
+# (it reconnects and resumes from its last alert ID).
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("ALERT_SUBSCRIBER_QUEUE_SIZE", 64))
+
+
+class AlertBus:
+    """In-process fan-out of alert events to every connected /api/alerts/stream client.
+
+    Each subscriber is just a bounded asyncio.Queue, so thousands of idle
+    connections cost a few KB each and publishing never blocks: a subscriber
+    whose queue is full is disconnected instead of slowing everyone down.
+    """
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, event: str, data: dict):
+        """Queue `event` for every subscriber. Must be called from the event loop thread."""
+        self.published += 1
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait((event, data))
+            except asyncio.QueueFull:
+                # Too far behind: drop it and wake its stream with a sentinel so it closes
+                self._subscribers.discard(queue)
+                self.dropped += 1
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+# Global alert bus
+alert_bus = AlertBus()
@@ -5,22 +5,33 @@ from datetime import datetime, timezone, timedelta
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import asyncio # <-- 1. ADDED THIS IMPORT
+import json
+import time
+import threading
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 
 # --- CRITICAL FIX: CONSOLIDATED SQLMODEL IMPORTS ---
 # These must be imported first because they are used immediately below for Database Setup and Models.
-from sqlmodel import SQLModel, Field, create_engine, Session, select, delete
+from sqlmodel import SQLModel, Field, select, delete, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel.ext.asyncio.session import AsyncSession
 # ----------------------------------------------------
 
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status
+from fastapi import FastAPI, APIRouter, Depends, Header, HTTPException, Request, status
 from fastapi.security import HTTPBearer
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
-import google.generativeai as genai
+from pydantic import BaseModel, ConfigDict
+from typing import AsyncIterator, Callable, List, Optional
 
 # --- AUTH IMPORTS ---
 from passlib.context import CryptContext
 from jose import JWTError, jwt
+from auth_cache import (
+    get_verified_username, cache_verified_token, get_cached_worker, cache_worker, register_worker_model,
+    token_cache, worker_cache
+)
 # --------------------
 
 
@@ -29,11 +40,9 @@ logger = logging.getLogger(__name__)
 # --- RAG Imports and Setup (Kept for completeness, though these are defined in rag_setup.py) ---
 # NOTE: This block is usually separated into models.py and rag_setup.py, but is kept here based on your file structure.
 
-# Database Setup
+# Database Setup (engines, WAL pragmas and async sessions live in database.py)
 ROOT_DIR = Path(__file__).parent
-DATABASE_URL = f"sqlite:///{ROOT_DIR}/health_chatbot.db"
-# This line now works because create_engine is imported above
-engine = create_engine(DATABASE_URL, echo=False)
+from database import engine, async_engine, async_session_maker, create_db_and_tables, get_session
 
 # START: Database Models (Needed for SQLModel functions)
 class Worker(SQLModel, table=True):
@@ -42,6 +51,8 @@ class Worker(SQLModel, table=True):
     hashed_password: str
 
 class Alert(SQLModel, table=True):
+    # Never reuse IDs after clear_alerts, so a client's last-seen ID stays meaningful
+    __table_args__ = {"sqlite_autoincrement": True}
     id: Optional[int] = Field(default=None, primary_key=True)
     message: str
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -50,13 +61,16 @@ class Inventory(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     item_name: str = Field(unique=True, index=True)
     quantity: int
+    # Inventory version of the last write to this row (for delta sync)
+    version: int = Field(default=0, index=True, sa_column_kwargs={"server_default": "0"})
 
-def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+class InventoryVersion(SQLModel, table=True):
+    # One row (id=1), bumped in the same transaction as every inventory write
+    id: Optional[int] = Field(default=None, primary_key=True)
+    version: int = 0
 
-def get_session():
-    with Session(engine) as session:
-        yield session
+# Drop cached tokens/worker rows when a worker is changed or removed
+register_worker_model(Worker)
 # END: Database Models
 
 
@@ -86,7 +100,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 async def get_current_worker(
-    session: Session = Depends(get_session), 
+    session: AsyncSession = Depends(get_session), 
     token: str = Depends(oauth2_scheme)
 ) -> Worker:
     credentials_exception = HTTPException(
@@ -94,17 +108,24 @@ async def get_current_worker(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+    # A token seen before already passed the signature and expiry checks
+    username = get_verified_username(token.credentials)
+    if username is None:
+        try:
+            payload = jwt.decode(token.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+            username: str = payload.get("sub")
+            if username is None:
+                raise credentials_exception
+        except JWTError:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+        cache_verified_token(token.credentials, payload)
     
-    worker = session.exec(select(Worker).where(Worker.username == username)).first()
+    worker = get_cached_worker(username)
     if worker is None:
-        raise credentials_exception
+        worker = (await session.exec(select(Worker).where(Worker.username == username))).first()
+        if worker is None:
+            raise credentials_exception
+        cache_worker(worker)
     return worker
 # --- END AUTHENTICATION CODE ---
 
@@ -116,55 +137,227 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+from health import readiness, READY_REQUIRES, STARTING, READY, FAILED, DISABLED
+
+from llm_gateway import LLM_BACKEND, LLMTimeoutError, llm_gateway
+
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
+if not GOOGLE_API_KEY and LLM_BACKEND == "gemini":
     logger.error("FATAL ERROR: GOOGLE_API_KEY environment variable not set.")
-else:
-    genai.configure(api_key=GOOGLE_API_KEY)
 
-# Import RAG system
-try:
-    from rag_setup import rag_system
-    RAG_INITIALIZED = True
-except ImportError:
-    logger.error("Could not import rag_system. RAG features will be disabled.")
-    RAG_INITIALIZED = False
+# Chat works with a fake LLM backend (tests, benchmarks) even without an API key
+LLM_CONFIGURED = bool(GOOGLE_API_KEY) or LLM_BACKEND != "gemini"
+# Translation is on the critical path of every non-English chat; give up on it early
+TRANSLATION_TIMEOUT_SECONDS = float(os.getenv("TRANSLATION_TIMEOUT_SECONDS", 10))
+
+# google.generativeai, LangChain and torch take seconds to import, so none of them are
+# imported at module load: the app starts serving first and warms them up in the background.
+
+# Set by init_rag_system() once rag_setup has been imported in the background
+rag_system = None
+
+# Where retrieval runs (override via environment):
+#   local   - this process loads the embedding model and the index (the original path)
+#   service - the retrieval sidecar (rag_service.py) does, shared by every worker; use it
+#             when running several workers, each of which would otherwise hold its own copy
+RAG_MODE = os.getenv("RAG_MODE", "local")
+from rag_service import RAG_SERVICE_STATS_TIMEOUT
+
+# --- Bounded executor for the blocking retrieval stage of chat ---
+# Retrieval threads mostly wait on the micro-batching query embedder (one model call per
+# batch), so allow as many as a full embedding batch.
+RAG_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv("RAG_WORKERS", 32)), thread_name_prefix="rag")
+
+from cache import LRUTTLCache, PersistentLRUCache, normalize_query
+from language import needs_translation, translation_prompt
+from inventory_index import inventory_index
+from alert_bus import alert_bus
+from inventory_import import (
+    BULK_INVENTORY_MAX_ROWS, InventoryImportError, ValidatedRows, iter_csv_rows, iter_json_rows
+)
+from metrics import metrics, stage, record_stage, MetricsMiddleware, PROMETHEUS_CONTENT_TYPE
+from context_packer import (
+    CONTEXT_TOKEN_BUDGET, CONTEXT_CANDIDATE_CHUNKS, INVENTORY_CONTEXT_MAX_ROWS, estimate_tokens, pack_chunks
+)
+
+# Alert push stream: idle keep-alive interval and client reconnect delay
+ALERT_STREAM_HEARTBEAT_SECONDS = float(os.getenv("ALERT_STREAM_HEARTBEAT_SECONDS", 15))
+ALERT_STREAM_RETRY_MS = int(os.getenv("ALERT_STREAM_RETRY_MS", 3000))
+
+# How non-English chat queries reach retrieval (override via environment):
+#   translate - translate to English with the LLM first (the original path)
+#   direct    - embed the original query; the multilingual embedder matches it against the
+#               English knowledge base, saving an LLM round-trip. Needs the torch or onnx
+#               embedding backend (hashed n-grams are not cross-lingual); compare the two
+#               with eval_multilingual.py.
+RETRIEVAL_LANGUAGE_MODE = os.getenv("RETRIEVAL_LANGUAGE_MODE", "translate")
+
+# How often the inventory version is checked so the in-memory index picks up writes from
+# other workers; a check is one primary-key read, a reload only happens after a write
+INVENTORY_INDEX_REFRESH_SECONDS = float(os.getenv("INVENTORY_INDEX_REFRESH_SECONDS", 5))
+
+# --- Answer cache for /api/chat ---
+# Keyed on (normalized translated query, language, retrieved chunk IDs). Answers built
+# from inventory data are tagged so update_inventory can drop them.
+ANSWER_CACHE_TAG_INVENTORY = "inventory"
+answer_cache = LRUTTLCache(
+    maxsize=int(os.getenv("ANSWER_CACHE_SIZE", 1024)),
+    ttl=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", 3600))
+)
+
+# --- Translation cache (query -> English), persisted across restarts ---
+translation_cache = PersistentLRUCache(
+    os.getenv("TRANSLATION_CACHE_PATH", str(ROOT_DIR / "translation_cache.db")),
+    maxsize=int(os.getenv("TRANSLATION_CACHE_SIZE", 5000))
+)
+
+# --- Metrics read at scrape time from the components' own counters ---
+
+def _cache_samples(field: str) -> list:
+    caches = {"answer": answer_cache, "translation": translation_cache, "token": token_cache, "worker": worker_cache}
+    return [({"cache": name}, cache.stats()[field]) for name, cache in caches.items()]
+
+def _embedder_samples(field: str) -> list:
+    if rag_system is None or rag_system.query_embeddings is None:
+        return []
+    stats = rag_system.query_embeddings.stats()
+    return [({}, stats[field])] if stats else []
+
+metrics.counter_callback("cache_hits_total", "Cache lookups answered from the cache", lambda: _cache_samples("hits"))
+metrics.counter_callback("cache_misses_total", "Cache lookups that missed", lambda: _cache_samples("misses"))
+metrics.gauge_callback("cache_hit_ratio", "Hits / lookups since startup", lambda: _cache_samples("hit_rate"))
+metrics.gauge_callback("cache_entries", "Entries currently cached", lambda: _cache_samples("size"))
+metrics.counter_callback(
+    "llm_gateway_events_total", "LLM gateway calls, upstream calls, singleflight hits, retries, timeouts, failures",
+    lambda: [({"event": event}, count) for event, count in llm_gateway.stats.items()]
+)
+metrics.gauge_callback("llm_calls_in_flight", "Distinct LLM completions in flight", lambda: [({}, llm_gateway.in_flight)])
+metrics.counter_callback(
+    "rag_retrievals_total", "Retrievals by path: BM25 fast path, hybrid fusion or vector only",
+    lambda: [({"path": path}, count) for path, count in rag_system.retrieval_stats.items()] if rag_system else []
+)
+metrics.gauge_callback("embedding_queue_depth", "Queries waiting for the embedding batcher",
+                       lambda: _embedder_samples("queue_depth"))
+metrics.counter_callback("embedding_batches_total", "Query embedding batches run", lambda: _embedder_samples("batches"))
+metrics.counter_callback("embedding_queries_total", "Queries embedded through the batcher",
+                         lambda: _embedder_samples("requests"))
+metrics.gauge_callback(
+    "rag_service_memory_bytes", "Resident memory of the retrieval sidecar (RAG_MODE=service)",
+    lambda: [({"kind": kind}, value) for kind, value in (rag_system.last_stats.get("memory") or {}).items()]
+    if RAG_MODE == "service" and rag_system else []
+)
+metrics.gauge_callback("alert_stream_subscribers", "Open alert push streams",
+                       lambda: [({}, alert_bus.subscriber_count)])
 
 # --- NEW HELPER FUNCTION: Translate query for RAG ---
 async def translate_query_to_english(query: str) -> str:
     """Uses Gemini to translate a query to English for RAG search."""
+    # Queries typed in Latin script (English, drug names) need no round-trip
+    if not needs_translation(query):
+        return query
+    
+    cache_key = normalize_query(query)
+    cached = translation_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        model = genai.GenerativeModel('models/gemini-2.5-flash')
-        prompt = f"Translate the following user query to a single sentence of plain English. Return ONLY the translated sentence, with no other commentary: '{query}'"
+        prompt = translation_prompt(query)
         
-        # --- 2. RUN BLOCKING CALL IN A THREAD ---
-        response = await asyncio.to_thread(model.generate_content, prompt)
+        # Shared client: bounded concurrency, identical concurrent queries share one call
+        response_text = await llm_gateway.generate(prompt, timeout=TRANSLATION_TIMEOUT_SECONDS)
         
         # Clean up the response, ensuring it's a single line and stripped of whitespace
-        return response.text.strip().split('\n')[0]
+        translated = response_text.strip().split('\n')[0]
+        if translated:
+            translation_cache.set(cache_key, translated)
+        return translated
     except Exception as e:
         logger.error(f"Translation failed, using original query: {e}")
         return query # Fallback to original query
 # --- END NEW HELPER FUNCTION ---
 
 
+# --- Background warm-up of the slow subsystems ---
+def init_llm_client():
+    if not LLM_CONFIGURED:
+        readiness.set("llm", DISABLED, "GOOGLE_API_KEY not set")
+        return
+    readiness.set("llm", STARTING)
+    try:
+        llm_gateway.warm_up()
+        readiness.set("llm", READY)
+    except Exception as e:
+        logger.error(f"Failed to load the LLM client: {str(e)}")
+        readiness.set("llm", FAILED, str(e))
+
+def init_rag_system():
+    """Import rag_setup, load the embedder and build the index. Runs in a background thread."""
+    global rag_system
+    if RAG_MODE == "service":
+        init_remote_rag_system()
+        return
+    readiness.set("embeddings", STARTING)
+    try:
+        from rag_setup import rag_system as system
+        logger.info("Initializing RAG system...")
+        system.load_embeddings()
+        readiness.set("embeddings", READY)
+    except Exception as e:
+        logger.error(f"Failed to initialize RAG system: {str(e)}")
+        readiness.set("embeddings", FAILED, str(e))
+        readiness.set("vector_store", FAILED, "embeddings unavailable")
+        return
+    
+    readiness.set("vector_store", STARTING)
+    try:
+        system.build_index()
+        rag_system = system
+        readiness.set("vector_store", READY)
+        logger.info("RAG system initialized successfully")
+    except Exception as e:
+        logger.error(f"Failed to initialize RAG system: {str(e)}")
+        readiness.set("vector_store", FAILED, str(e))
+
+def init_remote_rag_system():
+    """Wait for the retrieval sidecar; it answers once its model and index are loaded."""
+    global rag_system
+    readiness.set("embeddings", STARTING, "waiting for the RAG service")
+    readiness.set("vector_store", STARTING, "waiting for the RAG service")
+    try:
+        from rag_service import RemoteRAGSystem
+        system = RemoteRAGSystem()
+        system.wait_until_ready()
+        rag_system = system
+        readiness.set("embeddings", READY, "RAG service")
+        readiness.set("vector_store", READY, "RAG service")
+        logger.info(f"Using the RAG service at {system.socket_path}")
+    except Exception as e:
+        logger.error(f"Failed to reach the RAG service: {str(e)}")
+        readiness.set("embeddings", FAILED, str(e))
+        readiness.set("vector_store", FAILED, str(e))
+
+def rag_ready() -> bool:
+    return rag_system is not None
+
 # Lifespan context manager for startup/shutdown
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting up application...")
+    readiness.set("database", STARTING)
     create_db_and_tables()
     
     # Create default worker account
-    with Session(engine) as session:
-        existing_worker = session.exec(select(Worker).where(Worker.username == "healthworker")).first()
+    async with async_session_maker() as session:
+        existing_worker = (await session.exec(select(Worker).where(Worker.username == "healthworker"))).first()
         if not existing_worker:
             default_worker = Worker(
                 username="healthworker",
                 hashed_password=get_password_hash("securepass")
             )
             session.add(default_worker)
-            session.commit()
+            await session.commit()
             logger.info("Default health worker account created")
         
         # Add sample inventory items
@@ -176,26 +369,39 @@ async def lifespan(app: FastAPI):
             {"item_name": "Thermometers", "quantity": 30}
         ]
         
-        for item in inventory_items:
-            existing_item = session.exec(select(Inventory).where(Inventory.item_name == item["item_name"])).first()
-            if not existing_item:
-                session.add(Inventory(**item))
-        session.commit()
+        if await session.get(InventoryVersion, 1) is None:
+            session.add(InventoryVersion(id=1, version=0))
+            await session.commit()
+        
+        missing_items = [
+            item for item in inventory_items
+            if not (await session.exec(select(Inventory).where(Inventory.item_name == item["item_name"]))).first()
+        ]
+        if missing_items:
+            version = await bump_inventory_version(session)
+            for item in missing_items:
+                session.add(Inventory(**item, version=version))
+        await session.commit()
         logger.info("Sample inventory items added")
+    readiness.set("database", READY)
     
-    # Setup RAG system
-    if RAG_INITIALIZED:
-        try:
-            logger.info("Initializing RAG system...")
-            rag_system.setup()
-            logger.info("RAG system initialized successfully")
-        except Exception as e:
-            logger.error(f"Failed to initialize RAG system: {str(e)}")
+    readiness.set("inventory_index", STARTING)
+    await load_inventory_index()
+    readiness.set("inventory_index", READY)
+    
+    # Load the LLM client, embedder and vector store without holding up startup;
+    # until they are ready chat answers from inventory data only. Daemon threads, so a
+    # shutdown during warm-up does not wait for the model to finish loading.
+    threading.Thread(target=init_llm_client, name="warmup-llm", daemon=True).start()
+    threading.Thread(target=init_rag_system, name="warmup-rag", daemon=True).start()
     
     yield
     
     # Shutdown
     logger.info("Shutting down application...")
+    RAG_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+    llm_gateway.shutdown()
+    await async_engine.dispose()
 
 # --- FastAPI App Definition ---
 app = FastAPI(lifespan=lifespan)
@@ -226,9 +432,19 @@ class BroadcastAlertRequest(BaseModel):
     message: str
 
 class InventoryResponse(BaseModel):
+    # Built straight from Inventory rows (e.g. inside InventoryDeltaResponse)
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     item_name: str
     quantity: int
+    version: int = 0
+
+class InventoryDeltaResponse(BaseModel):
+    version: int
+    # True when `items` is the whole inventory rather than the rows changed since `since`
+    full: bool
+    items: List[InventoryResponse]
 
 class UpdateInventoryRequest(BaseModel):
     item_name: str
@@ -237,82 +453,168 @@ class UpdateInventoryRequest(BaseModel):
 class StatusResponse(BaseModel):
     status: str
 
+class BulkInventoryRowResult(BaseModel):
+    row: int
+    item_name: Optional[str] = None
+    status: str  # created | updated | error
+    error: Optional[str] = None
+
+class BulkInventoryResponse(BaseModel):
+    status: str  # success | partial | rejected
+    created: int
+    updated: int
+    errors: int
+    results: List[BulkInventoryRowResult]
+
 # --- Helper Function ---
-def is_inventory_query(query: str) -> bool:
-    inventory_keywords = [
-        "inventory", "stock", "available", "supply", "medicine", "vaccine", 
-        "tablet", "injection", "bandage", "equipment", "how many", "do you have",
-        "इन्वेंटरी", "स्टॉक", "उपलब्ध", "दवा", "टीका",
-        "ಇನ್ವೆಂಟರಿ", "ಸ್ಟಾಕ್", "ಲಭ್ಯವಿದೆ", "ಔಷಧ", "ಲಸಿಕೆ"
-    ]
-    query_lower = query.lower()
-    return any(keyword in query_lower for keyword in inventory_keywords)
+def is_inventory_query(query: str, language: str = None) -> bool:
+    # Keywords per language live in inventory_keywords.json
+    return inventory_index.is_general_query(query, language)
 
 # --- API Endpoints ---
 
-# Public Endpoints
-@api_router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest, session: Session = Depends(get_session)):
-    if not GOOGLE_API_KEY:
-        raise HTTPException(status_code=500, detail="Server is not configured with an AI API key.")
-        
-    try:
-        query = request.query
-        language = request.language
-        context_parts = []
-        
-        # Determine the query language and translate if necessary
-        rag_query = query
-        if language != 'en':
-            rag_query = await translate_query_to_english(query)
-            logger.info(f"Translated query: {rag_query}")
-        
-        # --- MODIFIED INVENTORY LOGIC ---
-        
-        # 1. Check for general inventory queries (using the translated query)
-        if is_inventory_query(rag_query):
-            inventory_items = session.exec(select(Inventory)).all()
-            if inventory_items:
-                inventory_context = "Current Inventory Status:\n"
-                for item in inventory_items:
-                    inventory_context += f"- {item.item_name}: {item.quantity} units available\n"
-                context_parts.append(inventory_context)
-        
-        # 2. Check for specific item queries (if not a general query)
+@dataclass
+class ChatContext:
+    """Everything the chat endpoints need to prompt the model (or answer from cache)."""
+    prompt: str
+    cache_key: tuple
+    uses_inventory: bool
+    # Built without the knowledge base because the RAG index is still loading
+    degraded: bool = False
+
+async def current_inventory_version(session: AsyncSession) -> int:
+    return (await session.exec(select(InventoryVersion.version).where(InventoryVersion.id == 1))).first() or 0
+
+async def bump_inventory_version(session: AsyncSession) -> int:
+    """Claim the next inventory version inside the caller's transaction. The UPDATE takes
+    SQLite's write lock first, so concurrent writers (in any worker) get distinct versions."""
+    statement = (
+        update(InventoryVersion)
+        .where(InventoryVersion.id == 1)
+        .values(version=InventoryVersion.version + 1)
+        .returning(InventoryVersion.version)
+    )
+    return (await session.exec(statement)).scalar_one()
+
+async def load_inventory_index():
+    """(Re)load the in-memory inventory index from the database."""
+    async with async_session_maker() as session:
+        # Version first: a write landing in between leaves the index newer than its
+        # version, which only costs one extra reload
+        version = await current_inventory_version(session)
+        items = (await session.exec(select(Inventory.item_name, Inventory.quantity))).all()
+    inventory_index.load(items, version)
+
+async def refresh_inventory_index_if_stale():
+    # Writes through this process update the index directly; the version check picks
+    # up writes made by other worker processes.
+    if time.monotonic() - inventory_index.loaded_at > INVENTORY_INDEX_REFRESH_SECONDS:
+        async with async_session_maker() as session:
+            version = await current_inventory_version(session)
+        if version != inventory_index.version:
+            await load_inventory_index()
         else:
-            # Fetch all item names from the database
-            all_item_names_query = select(Inventory.item_name)
-            all_item_names = [item[0] for item in session.exec(all_item_names_query).all()]
-            found_items = []
-            
-            for item_name in all_item_names:
-                # Check if the (lowercase) item name is in the (lowercase) translated query
-                if item_name.lower() in rag_query.lower():
-                    # If found, get the full item details
-                    item_details = session.exec(select(Inventory).where(Inventory.item_name == item_name)).first()
-                    if item_details:
-                        found_items.append(f"- {item_details.item_name}: {item_details.quantity} units available")
-            
-            if found_items:
-                # If we found specific items, add them to the context
-                inventory_context = "Specific Item Availability:\n" + "\n".join(found_items)
-                context_parts.append(inventory_context)
-        
-        # --- END MODIFIED INVENTORY LOGIC ---
-        
-        if RAG_INITIALIZED:
-            # RAG search uses the translated query (rag_query)
-            rag_context = rag_system.query(rag_query, k=3)
-            if rag_context:
-                context_parts.append(f"Knowledge Base Information:\n{rag_context}")
-        
-        full_context = "\n\n".join(context_parts) if context_parts else "No specific context available."
-        
-        language_names = {"en": "English", "hi": "Hindi (हिन्दी)", "kn": "Kannada (ಕನ್ನಡ)"}
-        language_name = language_names.get(language, "English")
-        
-        # --- MODIFIED PROMPT: STRICT RAG - NO DISCLAIMERS - USE RELATED CONTEXT ---
-        prompt = f"""You are a public health information assistant. Your job is to summarize and translate information from a knowledge base.
+            inventory_index.loaded_at = time.monotonic()
+
+def lookup_inventory_context(query: str, rag_query: str, language: str) -> str:
+    """Inventory stage: stock lines relevant to the query ("" if none), served from the in-memory index."""
+    # 1. Check for specific item queries: one pass over the translated query, plus the
+    # original query against the user's language aliases. Naming an item ("do you have
+    # paracetamol?") lists only that item, even though the query also reads as general.
+    found = dict(inventory_index.match(rag_query))
+    if language != 'en':
+        found.update(inventory_index.match(query, language))
+    if found:
+        found_items = [f"- {item_name}: {quantity} units available" for item_name, quantity in found.items()]
+        return "Specific Item Availability:\n" + "\n".join(found_items)
+    
+    # 2. Check for general inventory queries: the translated query, and the original one
+    # against the user's language keywords (the only check when queries are not translated)
+    if is_inventory_query(rag_query) or (language != 'en' and is_inventory_query(query, language)):
+        inventory_items = inventory_index.all_items()
+        if inventory_items:
+            inventory_context = "Current Inventory Status:\n"
+            for item_name, quantity in inventory_items[:INVENTORY_CONTEXT_MAX_ROWS]:
+                inventory_context += f"- {item_name}: {quantity} units available\n"
+            if len(inventory_items) > INVENTORY_CONTEXT_MAX_ROWS:
+                inventory_context += f"- ...and {len(inventory_items) - INVENTORY_CONTEXT_MAX_ROWS} more items\n"
+            return inventory_context
+    return ""
+
+def retrieve_knowledge(rag_query: str) -> tuple:
+    """Retrieval stage: (chunk texts, chunk_ids) from the RAG index, best first. CPU-bound; runs on RAG_EXECUTOR."""
+    if not rag_ready():
+        return [], []
+    docs = rag_system.retrieve(rag_query, k=CONTEXT_CANDIDATE_CHUNKS)
+    return [doc.page_content for doc in docs], [doc.metadata.get("chunk_id", "") for doc in docs]
+
+def assemble_context(inventory_context: str, rag_context: str) -> str:
+    context_parts = []
+    if inventory_context:
+        context_parts.append(inventory_context)
+    if rag_context:
+        context_parts.append(f"Knowledge Base Information:\n{rag_context}")
+    return "\n\n".join(context_parts) if context_parts else "No specific context available."
+
+async def build_chat_context(query: str, language: str) -> ChatContext:
+    """Shared context building for /chat and /chat/stream.
+
+    Stages: translation (async LLM call) -> RAG retrieval on its bounded executor,
+    concurrently with an inventory index refresh if it is stale -> in-memory inventory
+    match -> packing into CONTEXT_TOKEN_BUDGET -> prompt assembly. English and
+    Latin-script queries, and every query in RETRIEVAL_LANGUAGE_MODE=direct, have no
+    translation stage.
+    """
+    loop = asyncio.get_running_loop()
+    degraded = not rag_ready()
+    
+    # Stage 1: determine the query language and translate if necessary
+    rag_query = query
+    if language != 'en' and RETRIEVAL_LANGUAGE_MODE == "translate":
+        with stage("translate"):
+            rag_query = await translate_query_to_english(query)
+        logger.info(f"Translated query: {rag_query}")
+    
+    # Stage 2: retrieval (timed including the wait for an executor thread), side by
+    # side with keeping the inventory index fresh
+    async def timed_retrieval():
+        with stage("retrieve"):
+            return await loop.run_in_executor(RAG_EXECUTOR, retrieve_knowledge, rag_query)
+    (chunk_texts, chunk_ids), _ = await asyncio.gather(timed_retrieval(), refresh_inventory_index_if_stale())
+    with stage("inventory"):
+        inventory_context = lookup_inventory_context(query, rag_query, language)
+    
+    # Stage 3: packing. Inventory rows are short and exact, so they are kept whole and
+    # the knowledge base text gets whatever budget is left.
+    with stage("pack"):
+        knowledge_budget = CONTEXT_TOKEN_BUDGET - estimate_tokens(inventory_context)
+        rag_context = pack_chunks(rag_query, chunk_texts, knowledge_budget)
+    
+    # Stage 4: prompt assembly
+    with stage("prompt"):
+        prompt = build_chat_prompt(assemble_context(inventory_context, rag_context), query, language)
+    unpacked_tokens = estimate_tokens(
+        build_chat_prompt(assemble_context(inventory_context, "\n\n".join(chunk_texts)), query, language)
+    )
+    logger.info(f"Prompt tokens (estimated): {unpacked_tokens} before packing, {estimate_tokens(prompt)} after")
+    
+    # Same question, same language, same retrieved chunks (and same stock levels, if
+    # quoted) -> same answer. The version also retires answers after another worker's write.
+    inventory_version = inventory_index.version if inventory_context else None
+    cache_key = (normalize_query(rag_query), language, tuple(chunk_ids), inventory_version)
+    return ChatContext(
+        prompt=prompt,
+        cache_key=cache_key,
+        uses_inventory=bool(inventory_context),
+        degraded=degraded
+    )
+
+def build_chat_prompt(full_context: str, query: str, language: str) -> str:
+    language_names = {"en": "English", "hi": "Hindi (हिन्दी)", "kn": "Kannada (ಕನ್ನಡ)"}
+    language_name = language_names.get(language, "English")
+    
+    # --- MODIFIED PROMPT: STRICT RAG - NO DISCLAIMERS - USE RELATED CONTEXT ---
+    return f"""You are a public health information assistant. Your job is to summarize and translate information from a knowledge base.
 Your answer MUST be in {language_name}.
 
 **CRITICAL INSTRUCTIONS:**
@@ -327,30 +629,206 @@ CONTEXT:
 QUERY: {query}
 
 Answer in {language_name}:"""
+
+def cache_answer(context: ChatContext, answer: str):
+    if context.degraded:
+        return  # would otherwise outlive the index warm-up
+    answer_cache.set(context.cache_key, answer, tags=(ANSWER_CACHE_TAG_INVENTORY,) if context.uses_inventory else ())
+
+# --- Streaming text generation (pluggable) ---
+def get_text_generator() -> Callable[[str], AsyncIterator[str]]:
+    """Dependency returning the streaming generator. Tests can override it, or run the
+    whole app against the fake backend with LLM_BACKEND=fake."""
+    return llm_gateway.stream
+
+def sse_event(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    id_line = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{id_line}event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def alert_payload(alert: Alert) -> dict:
+    return {"id": alert.id, "message": alert.message, "timestamp": alert.timestamp.isoformat()}
+
+# Health Endpoints
+@api_router.get("/health/live")
+async def health_live():
+    """Liveness: the process is up and its event loop is responsive."""
+    return {"status": "ok"}
+
+@api_router.get("/health/ready")
+async def health_ready():
+    """Readiness: 200 once the HEALTH_READY_REQUIRES subsystems are ready, 503 before.
+
+    `status` is "degraded" while optional subsystems (the RAG index) are still loading
+    or failed, in which case chat answers from inventory data only.
+    """
+    snapshot = readiness.snapshot()
+    states = {name: entry["state"] for name, entry in snapshot["subsystems"].items()}
+    if not readiness.is_ready(*READY_REQUIRES):
+        status_text, status_code = "starting", 503
+    elif all(state in (READY, DISABLED) for state in states.values()):
+        status_text, status_code = "ready", 200
+    else:
+        status_text, status_code = "degraded", 200
+    return JSONResponse(status_code=status_code, content={"status": status_text, **snapshot})
+
+# Public Endpoints
+@api_router.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest):
+    if not LLM_CONFIGURED:
+        raise HTTPException(status_code=500, detail="Server is not configured with an AI API key.")
         
-        # --- MODEL NAME (Using the model confirmed to work) ---
-        model = genai.GenerativeModel('models/gemini-2.5-flash')
+    try:
+        context = await build_chat_context(request.query, request.language)
+        
+        cached_answer = answer_cache.get(context.cache_key)
+        if cached_answer is not None:
+            logger.info(f"Answer cache hit ({answer_cache.stats()['hit_rate']:.0%} hit rate)")
+            return ChatResponse(response=cached_answer)
         
-        # --- 3. RUN BLOCKING CALL IN A THREAD ---
-        response = await asyncio.to_thread(model.generate_content, prompt)
+        with stage("llm"):
+            answer = await llm_gateway.generate(context.prompt)
         
-        return ChatResponse(response=response.text)
+        cache_answer(context, answer)
+        return ChatResponse(response=answer)
         
+    except LLMTimeoutError as e:
+        logger.error(f"Error in chat endpoint: {str(e)}")
+        raise HTTPException(status_code=504, detail="The AI service took too long to respond.")
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
+@api_router.post("/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    generate: Callable[[str], AsyncIterator[str]] = Depends(get_text_generator)
+):
+    """Same answer as /chat, sent as Server-Sent Events while the model generates it.
+
+    Emits `token` events ({"text": ...}), then one `done` event ({"response": full_text}),
+    or an `error` event ({"detail": ...}) if generation fails midway.
+    """
+    if not LLM_CONFIGURED and generate == llm_gateway.stream:
+        raise HTTPException(status_code=500, detail="Server is not configured with an AI API key.")
+    
+    try:
+        context = await build_chat_context(request.query, request.language)
+    except Exception as e:
+        logger.error(f"Error in chat stream endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+    
+    async def event_stream():
+        cached_answer = answer_cache.get(context.cache_key)
+        if cached_answer is not None:
+            yield sse_event("token", {"text": cached_answer})
+            yield sse_event("done", {"response": cached_answer})
+            return
+        
+        parts = []
+        # Recorded in the stage histograms only: the headers have gone out by now
+        start = time.perf_counter()
+        try:
+            with stage("llm"):
+                async for text in generate(context.prompt):
+                    if not parts:
+                        record_stage("llm_first_token", time.perf_counter() - start)
+                    parts.append(text)
+                    yield sse_event("token", {"text": text})
+        except Exception as e:
+            logger.error(f"Error while streaming chat answer: {str(e)}")
+            yield sse_event("error", {"detail": f"An error occurred: {str(e)}"})
+            return
+        
+        answer = "".join(parts)
+        cache_answer(context, answer)
+        yield sse_event("done", {"response": answer})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Disable proxy buffering so tokens reach slow clients as they are produced
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @api_router.get("/get-alerts", response_model=List[AlertResponse])
-async def get_alerts(session: Session = Depends(get_session)):
-    alerts = session.exec(select(Alert).order_by(Alert.timestamp.desc())).all()
+async def get_alerts(session: AsyncSession = Depends(get_session)):
+    alerts = (await session.exec(select(Alert).order_by(Alert.timestamp.desc()))).all()
     return alerts
 
+@api_router.get("/alerts/stream")
+async def stream_alerts(last_id: Optional[int] = None, last_event_id: Optional[str] = Header(None)):
+    """Push alerts as Server-Sent Events instead of polling /get-alerts.
+
+    Sends `alert` events (SSE id = alert ID) as broadcast_alert commits them and a
+    `clear` event when clear_alerts runs. A reconnecting client resumes after its
+    last-seen alert ID (`Last-Event-ID` header, or `?last_id=`); if that alert has
+    since been cleared it gets `clear` followed by the current alerts.
+    """
+    if last_id is None and last_event_id and last_event_id.isdigit():
+        last_id = int(last_event_id)
+    last_id = last_id or 0
+    
+    # Subscribe before reading the backlog so nothing published in between is missed.
+    # The session is closed before streaming: idle subscribers must not hold pool connections.
+    queue = alert_bus.subscribe()
+    try:
+        async with async_session_maker() as session:
+            alerts = (await session.exec(select(Alert).order_by(Alert.id))).all()
+    except Exception:
+        alert_bus.unsubscribe(queue)
+        raise
+    
+    backlog = []
+    if last_id and last_id not in {alert.id for alert in alerts}:
+        # The alerts this client holds were cleared while it was away
+        backlog.append(sse_event("clear", {}))
+        last_id = 0
+    for alert in alerts:
+        if alert.id > last_id:
+            backlog.append(sse_event("alert", alert_payload(alert), alert.id))
+            last_id = alert.id
+    
+    async def event_stream():
+        sent_id = last_id
+        try:
+            yield f"retry: {ALERT_STREAM_RETRY_MS}\n\n"
+            for event in backlog:
+                yield event
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=ALERT_STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line: keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is None:
+                    # Dropped for falling behind; the client reconnects and resumes
+                    return
+                event, data = item
+                if event == "alert":
+                    if data["id"] <= sent_id:
+                        continue  # already sent as part of the backlog
+                    sent_id = data["id"]
+                    yield sse_event(event, data, data["id"])
+                else:
+                    sent_id = 0
+                    yield sse_event(event, data)
+        finally:
+            alert_bus.unsubscribe(queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Worker Endpoints
 @api_router.post("/worker/login", response_model=LoginResponse)
-async def worker_login(request: LoginRequest, session: Session = Depends(get_session)):
-    worker = session.exec(select(Worker).where(Worker.username == request.username)).first()
+async def worker_login(request: LoginRequest, session: AsyncSession = Depends(get_session)):
+    worker = (await session.exec(select(Worker).where(Worker.username == request.username))).first()
     
-    if not worker or not verify_password(request.password, worker.hashed_password):
+    # bcrypt is deliberately slow; keep it off the event loop
+    if not worker or not await asyncio.to_thread(verify_password, request.password, worker.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
@@ -362,49 +840,206 @@ async def worker_login(request: LoginRequest, session: Session = Depends(get_ses
 @api_router.post("/worker/broadcast-alert", response_model=StatusResponse)
 async def broadcast_alert(
     request: BroadcastAlertRequest,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_worker: Worker = Depends(get_current_worker) # <-- Protected
 ):
     new_alert = Alert(message=request.message)
     session.add(new_alert)
-    session.commit()
+    await session.commit()
+    alert_bus.publish("alert", alert_payload(new_alert))
     return StatusResponse(status="success")
 
+def inventory_etag(version: int, variant: str = "") -> str:
+    return f'"inventory-{version}{variant}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+# Clients revalidate on every load; an unchanged snapshot costs a 304 with no body
+INVENTORY_CACHE_HEADERS = {"Cache-Control": "private, no-cache"}
+
 @api_router.get("/worker/get-inventory", response_model=List[InventoryResponse])
 async def get_inventory(
-    session: Session = Depends(get_session),
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    session: AsyncSession = Depends(get_session),
     current_worker: Worker = Depends(get_current_worker) # <-- Protected
 ):
-    inventory = session.exec(select(Inventory)).all()
+    """The whole inventory, with an ETag of its version; If-None-Match gets a 304 while it is unchanged."""
+    # Version before rows: a write in between makes the rows newer than the ETag, so the
+    # client just fetches them again next time
+    version = await current_inventory_version(session)
+    etag = inventory_etag(version)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, **INVENTORY_CACHE_HEADERS})
+    inventory = (await session.exec(select(Inventory))).all()
+    response.headers.update({"ETag": etag, **INVENTORY_CACHE_HEADERS})
     return inventory
 
+@api_router.get("/worker/inventory-changes", response_model=InventoryDeltaResponse)
+async def get_inventory_changes(
+    response: Response,
+    since: int = 0,
+    if_none_match: Optional[str] = Header(None),
+    session: AsyncSession = Depends(get_session),
+    current_worker: Worker = Depends(get_current_worker) # <-- Protected
+):
+    """Rows written after inventory version `since`, and the current version to ask from next.
+
+    `since=0`, or a version ahead of the server's (the database was reset), returns the
+    whole inventory with `full: true`. Items are never deleted, so changes are upserts only.
+    """
+    version = await current_inventory_version(session)
+    full = since <= 0 or since > version
+    etag = inventory_etag(version, "" if full else f"-since-{since}")
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, **INVENTORY_CACHE_HEADERS})
+    statement = select(Inventory) if full else select(Inventory).where(Inventory.version > since)
+    items = (await session.exec(statement)).all()
+    response.headers.update({"ETag": etag, **INVENTORY_CACHE_HEADERS})
+    return InventoryDeltaResponse(version=version, full=full, items=items)
+
 @api_router.post("/worker/update-inventory", response_model=StatusResponse)
 async def update_inventory(
     request: UpdateInventoryRequest,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_worker: Worker = Depends(get_current_worker) # <-- Protected
 ):
-    item = session.exec(select(Inventory).where(Inventory.item_name == request.item_name)).first()
+    version = await bump_inventory_version(session)
+    item = (await session.exec(select(Inventory).where(Inventory.item_name == request.item_name))).first()
     
     if item:
         item.quantity = request.quantity
+        item.version = version
     else:
-        new_item = Inventory(item_name=request.item_name, quantity=request.quantity)
+        new_item = Inventory(item_name=request.item_name, quantity=request.quantity, version=version)
         session.add(new_item)
     
-    session.commit()
+    await session.commit()
+    inventory_index.upsert(request.item_name, request.quantity, version)
+    
+    # Cached answers that quoted stock levels, or that mention this item, are now stale
+    item_name_lower = request.item_name.lower()
+    answer_cache.invalidate_tag(ANSWER_CACHE_TAG_INVENTORY)
+    answer_cache.invalidate_where(lambda key: item_name_lower in key[0])
     return StatusResponse(status="success")
 
+async def _upload_chunks(upload, chunk_size: int = 64 * 1024):
+    while chunk := await upload.read(chunk_size):
+        yield chunk
+
+async def _json_rows(body: bytes):
+    for row in iter_json_rows(body):
+        yield row
+
+async def read_inventory_rows(request: Request) -> ValidatedRows:
+    """Parse and validate a bulk import body, row by row, before any database work."""
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        upload = (await request.form()).get("file")
+        if upload is None or isinstance(upload, str):
+            raise InventoryImportError("Expected a CSV file in the 'file' form field")
+        source = iter_csv_rows(_upload_chunks(upload))
+    elif "csv" in content_type or content_type.startswith("text/plain"):
+        source = iter_csv_rows(request.stream())
+    else:
+        source = _json_rows(await request.body())
+    
+    rows = ValidatedRows()
+    try:
+        async for row in source:
+            rows.add(*row)
+            if rows.total > BULK_INVENTORY_MAX_ROWS:
+                raise HTTPException(status_code=413, detail=f"At most {BULK_INVENTORY_MAX_ROWS} rows per import")
+    except Exception:
+        rows.close()
+        raise
+    return rows
+
+@api_router.post("/worker/bulk-update-inventory", response_model=BulkInventoryResponse)
+async def bulk_update_inventory(
+    request: Request,
+    atomic: bool = False,
+    session: AsyncSession = Depends(get_session),
+    current_worker: Worker = Depends(get_current_worker) # <-- Protected
+):
+    """Create or update many inventory items in one transaction (e.g. a monthly stock-take).
+
+    Body: a JSON array of {"item_name", "quantity"} objects, CSV with an item_name,quantity
+    header sent as text/csv (parsed as it streams in), or a CSV file uploaded as
+    multipart/form-data in the `file` field. Invalid rows are reported and skipped; with
+    `atomic=true` any invalid row rejects the whole import. A name repeated in the file
+    ends up with its last quantity.
+    """
+    try:
+        rows = await read_inventory_rows(request)
+    except InventoryImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    results = list(rows.rejected)
+    created = updated = 0
+    try:
+        if atomic and rows.rejected:
+            return BulkInventoryResponse(status="rejected", created=0, updated=0, errors=len(results), results=results)
+        
+        # Set-based: per batch, one SELECT to tell inserts from updates and one
+        # INSERT ... ON CONFLICT DO UPDATE; a single commit (one fsync) at the end
+        seen = set()
+        version = await bump_inventory_version(session) if rows.count else None
+        for batch in rows.batches():
+            names = {item_name for _, item_name, _ in batch}
+            existing = set((await session.exec(select(Inventory.item_name).where(Inventory.item_name.in_(names)))).all())
+            statement = sqlite_insert(Inventory).values(
+                [{"item_name": item_name, "quantity": quantity, "version": version} for _, item_name, quantity in batch]
+            )
+            statement = statement.on_conflict_do_update(
+                index_elements=["item_name"],
+                set_={"quantity": statement.excluded.quantity, "version": statement.excluded.version}
+            )
+            await session.exec(statement)
+            for row, item_name, _ in batch:
+                is_update = item_name in existing or item_name in seen
+                seen.add(item_name)
+                created += not is_update
+                updated += is_update
+                results.append({"row": row, "item_name": item_name, "status": "updated" if is_update else "created"})
+        await session.commit()
+    except Exception as e:
+        await session.rollback()
+        logger.error(f"Bulk inventory update failed: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to update inventory")
+    finally:
+        rows.close()
+    
+    if seen:
+        await load_inventory_index()
+        # Answers quoting stock levels are stale; after a large import, so is nearly everything else
+        answer_cache.invalidate_tag(ANSWER_CACHE_TAG_INVENTORY)
+        names_lower = [name.lower() for name in seen]
+        if len(names_lower) > 100:
+            answer_cache.clear()
+        else:
+            answer_cache.invalidate_where(lambda key: any(name in key[0] for name in names_lower))
+    
+    results.sort(key=lambda result: result["row"])
+    errors = len(rows.rejected)
+    return BulkInventoryResponse(
+        status="partial" if errors else "success", created=created, updated=updated, errors=errors, results=results
+    )
+
 # --- NEW ENDPOINT (Clear Alerts) ---
 @api_router.post("/worker/clear-alerts", response_model=StatusResponse)
 async def clear_alerts(
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_worker: Worker = Depends(get_current_worker) # <-- Protected
 ):
     try:
         statement = delete(Alert)
-        session.exec(statement)
-        session.commit()
+        await session.exec(statement)
+        await session.commit()
+        alert_bus.publish("clear", {})
         return StatusResponse(status="success")
     except Exception as e:
         logger.error(f"Error clearing alerts: {str(e)}")
@@ -416,6 +1051,20 @@ async def clear_alerts(
 # Include router
 app.include_router(api_router)
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: request and stage latency histograms, counters and gauges."""
+    if RAG_MODE == "service" and rag_system is not None:
+        # One sidecar round-trip per scrape, off the event loop; the callbacks read the snapshot
+        try:
+            await asyncio.wait_for(asyncio.to_thread(rag_system.refresh_stats), RAG_SERVICE_STATS_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"RAG service stats unavailable, reporting the last ones: {e}")
+    return PlainTextResponse(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+# Request metrics, Server-Timing header and the slow-request profiler
+app.add_middleware(MetricsMiddleware)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -0,0 +1,69 @@
+import os
+import time
+import hashlib
+import logging
+from typing import Optional
+from sqlalchemy import event, inspect
+from cache import LRUTTLCache
+
+logger = logging.getLogger(__name__)
+
+# Verified tokens are cached until they expire (capped by TOKEN_CACHE_MAX_TTL_SECONDS);
+# worker rows for a short while, since they only change on password resets or removal.
+# Writes made through this process's ORM invalidate both at once. Writes from anywhere
+# else (another uvicorn worker, seed_db.py, a SQL shell) are not seen: such a process
+# keeps authenticating a removed or renamed worker for up to WORKER_CACHE_TTL_SECONDS,
+# after which the row is read again (a cached token alone never authenticates).
+TOKEN_CACHE_MAX_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_MAX_TTL_SECONDS", 3600))
+WORKER_CACHE_TTL_SECONDS = float(os.getenv("WORKER_CACHE_TTL_SECONDS", 30))
+
+token_cache = LRUTTLCache(maxsize=int(os.getenv("TOKEN_CACHE_SIZE", 10000)), ttl=TOKEN_CACHE_MAX_TTL_SECONDS)
+worker_cache = LRUTTLCache(maxsize=int(os.getenv("WORKER_CACHE_SIZE", 1024)), ttl=WORKER_CACHE_TTL_SECONDS)
+
+
+def _token_key(token: str) -> str:
+    # Key on a digest so raw bearer tokens are not kept in memory longer than needed
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def get_verified_username(token: str) -> Optional[str]:
+    """Username of a token whose signature and expiry were already checked, or None."""
+    return token_cache.get(_token_key(token))
+
+def cache_verified_token(token: str, payload: dict):
+    username = payload.get("sub")
+    expires_at = payload.get("exp")
+    if username is None or expires_at is None:
+        return
+    remaining = float(expires_at) - time.time()
+    if remaining > 0:
+        # Tagged with the username so invalidate_worker can revoke every cached token
+        token_cache.set(_token_key(token), username, tags=(username,), ttl=min(remaining, TOKEN_CACHE_MAX_TTL_SECONDS))
+
+def get_cached_worker(username: str):
+    return worker_cache.get(username)
+
+def cache_worker(worker):
+    worker_cache.set(worker.username, worker)
+
+def invalidate_worker(username: str):
+    """Forget the cached worker row and every cached token issued to `username`."""
+    worker_cache.invalidate_where(lambda key: key == username)
+    dropped = token_cache.invalidate_tag(username)
+    logger.info(f"Invalidated auth cache for {username} ({dropped} tokens)")
+
+
+def _on_worker_changed(mapper, connection, target):
+    # Invalidate under the old username too if it was renamed
+    history = inspect(target).attrs.username.history
+    for username in set(history.deleted or ()) | {target.username}:
+        invalidate_worker(username)
+
+def register_worker_model(worker_model):
+    """Invalidate the caches whenever a `worker_model` row is updated or deleted through the ORM.
+
+    Bulk statements (e.g. `delete(Worker)`) bypass these hooks; call invalidate_worker for those.
+    Only this process's caches are invalidated; other processes rely on WORKER_CACHE_TTL_SECONDS.
+    """
+    for identifier in ("after_update", "after_delete"):
+        if not event.contains(worker_model, identifier, _on_worker_changed):
+            event.listen(worker_model, identifier, _on_worker_changed)
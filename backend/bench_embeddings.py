@@ -0,0 +1,131 @@
+"""Compare the embedding backends on the knowledge base: load time, latency, throughput and recall.
+
+Usage (from backend/):
+    python bench_embeddings.py                       # all backends
+    python bench_embeddings.py --backends onnx hashed --k 3 --output bench_embeddings.json
+
+Recall@k is measured on retrieval_eval_queries.json: a query counts as a hit when a chunk
+from its expected source file is among the top-k. When torch is benchmarked too, each other
+backend also reports its top-k overlap with torch (how closely it reproduces today's results).
+"""
+import sys
+import json
+import time
+import argparse
+import statistics
+from pathlib import Path
+import numpy as np
+
+from ingest import parse_files
+from rag_setup import KNOWLEDGE_BASE_DIR, scan_knowledge_base
+from embeddings import EMBEDDING_BACKENDS, get_embeddings
+
+EVAL_QUERIES_PATH = Path(__file__).parent / "retrieval_eval_queries.json"
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB (Linux only; 0.0 elsewhere)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+def load_corpus():
+    files = {rel_path: "bench" for rel_path in scan_knowledge_base()}
+    texts, sources = [], []
+    for result in parse_files(KNOWLEDGE_BASE_DIR, files):
+        texts.extend(result["texts"])
+        sources.extend([result["rel_path"]] * len(result["texts"]))
+    return texts, sources
+
+def top_k(matrix: np.ndarray, query_vectors: np.ndarray, k: int) -> np.ndarray:
+    scores = query_vectors @ matrix.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+def normalize(vectors) -> np.ndarray:
+    array = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(array, axis=1, keepdims=True)
+    return array / np.maximum(norms, 1e-12)
+
+def bench_backend(backend: str, texts: list, sources: list, queries: list, k: int, repeats: int) -> dict:
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    embeddings = get_embeddings(backend)
+    # First call pays lazy initialisation (graph optimisation, thread pools); count it as load
+    embeddings.embed_query("warm up")
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matrix = normalize(embeddings.embed_documents(texts))
+    corpus_seconds = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(repeats):
+        for query in queries:
+            start = time.perf_counter()
+            embeddings.embed_query(query["en"])
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    query_vectors = normalize(embeddings.embed_documents([q["en"] for q in queries]))
+    hits = top_k(matrix, query_vectors, k)
+    recall = sum(
+        any(sources[i] == query["source"] for i in row) for row, query in zip(hits, queries)
+    ) / len(queries)
+
+    latencies.sort()
+    return {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 3),
+        "rss_mb_delta": round(current_rss_mb() - rss_before, 1),
+        "corpus_chunks_per_sec": round(len(texts) / corpus_seconds, 1),
+        "query_ms_p50": round(statistics.median(latencies), 2),
+        "query_ms_p95": round(latencies[int(0.95 * (len(latencies) - 1))], 2),
+        f"recall_at_{k}": round(recall, 3),
+        "_top_k": hits,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS), choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=5, help="passes over the eval queries for latency")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    with open(EVAL_QUERIES_PATH, encoding="utf-8") as f:
+        queries = json.load(f)
+    texts, sources = load_corpus()
+    print(f"Corpus: {len(texts)} chunks from {len(set(sources))} files; {len(queries)} eval queries")
+
+    results = []
+    for backend in args.backends:
+        print(f"\nBenchmarking {backend}...")
+        try:
+            results.append(bench_backend(backend, texts, sources, queries, args.k, args.repeats))
+        except Exception as e:
+            print(f"  FAILED: {e}")
+            results.append({"backend": backend, "error": str(e)})
+
+    reference_hits = next((r["_top_k"] for r in results if r["backend"] == "torch" and "_top_k" in r), None)
+    for result in results:
+        hits = result.pop("_top_k", None)
+        if reference_hits is not None and hits is not None and result["backend"] != "torch":
+            overlap = [len(set(a) & set(b)) / args.k for a, b in zip(hits, reference_hits)]
+            result[f"overlap_at_{args.k}_vs_torch"] = round(sum(overlap) / len(overlap), 3)
+
+    print()
+    for result in results:
+        print(json.dumps(result, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"k": args.k, "chunks": len(texts), "results": results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    # A backend that cannot load (missing optional dependency, unreachable model) is a failure
+    return 1 if any("error" in result for result in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
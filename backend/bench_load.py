@@ -0,0 +1,245 @@
+"""Offline load test: the whole FastAPI app in-process, a fake LLM and a deterministic embedder.
+
+Usage (from backend/):
+    python bench_load.py                                   # 20 clients for 30 s
+    python bench_load.py --concurrency 50 --duration 60 --output bench_load.json
+    python bench_load.py --compare bench_load.json         # exit 1 on a p95 / throughput regression
+
+Nothing leaves the machine: requests go through httpx's ASGI transport straight into the
+app, the LLM is the gateway's fake backend (LLM_FAKE_LATENCY_MS simulates generation time),
+embeddings use the hashed n-gram backend, and the database, vector index and translation
+cache live in a temporary directory. Virtual clients send a weighted mix of chat (en/hi/kn,
+plain and streaming), alert polling and worker inventory reads and updates. Per endpoint it
+reports requests, errors, throughput and p50/p95/p99 latency, plus the median of each
+stage in the app's Server-Timing header (translate, retrieve, llm, ...).
+
+The ASGI transport buffers each response, so streaming chat is timed to its last byte.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import tempfile
+import argparse
+import platform
+import subprocess
+from pathlib import Path
+
+# Must be set before the app modules read their configuration at import time
+WORK_DIR = Path(tempfile.mkdtemp(prefix="bench_load_"))
+for name, value in {
+    "EMBEDDING_BACKEND": "hashed",
+    "LLM_BACKEND": "fake",
+    "LLM_FAKE_LATENCY_MS": "50",
+    "VECTOR_STORE": "mmap",
+    "INGEST_WORKERS": "1",
+    "DATABASE_PATH": str(WORK_DIR / "bench.db"),
+    "CHROMA_DB_DIR": str(WORK_DIR / "index"),
+    "TRANSLATION_CACHE_PATH": str(WORK_DIR / "translation_cache.db"),
+}.items():
+    os.environ.setdefault(name, value)
+
+import httpx
+
+import auth
+from bench_embeddings import EVAL_QUERIES_PATH
+
+# Relative share of each request type in the mix
+TRAFFIC_MIX = {
+    "chat": 30,
+    "chat_stream": 10,
+    "get_alerts": 35,
+    "get_inventory": 10,
+    "update_inventory": 15,
+}
+INVENTORY_ITEMS = ["Tetanus Vaccine", "Paracetamol", "Bandages", "Antiseptic Solution", "Thermometers"]
+# Regression thresholds for --compare
+P95_REGRESSION = 1.20
+THROUGHPUT_REGRESSION = 0.85
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(p / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(samples: dict, elapsed: float, stages: dict = None) -> dict:
+    summary = {}
+    stages = stages or {}
+    for endpoint, records in sorted(samples.items()):
+        latencies = sorted(ms for ms, ok in records)
+        summary[endpoint] = {
+            "requests": len(records),
+            "errors": sum(1 for _, ok in records if not ok),
+            "throughput_rps": round(len(records) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "mean_ms": round(sum(latencies) / len(latencies), 2),
+            "max_ms": round(latencies[-1], 2),
+        }
+        if stages.get(endpoint):
+            summary[endpoint]["stage_p50_ms"] = {
+                name: round(percentile(sorted(values), 50), 2) for name, values in stages[endpoint].items()
+            }
+    return summary
+
+def parse_server_timing(header: str) -> dict:
+    """{stage: ms} from a Server-Timing header ("translate;dur=12.3, total;dur=40.1")."""
+    timings = {}
+    for entry in header.split(","):
+        name, _, params = entry.strip().partition(";")
+        if params.startswith("dur="):
+            timings[name] = float(params[4:])
+    return timings
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent).stdout.strip()
+    except OSError:
+        return ""
+
+
+class LoadGenerator:
+    def __init__(self, client: httpx.AsyncClient, token: str, queries: list, cache_busting: bool, seed: int):
+        self.client = client
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.queries = queries
+        self.cache_busting = cache_busting
+        self.rng = random.Random(seed)
+        self.samples = {}
+        self.stages = {}  # endpoint -> stage -> [ms]
+        self.sequence = 0
+
+    def _chat_body(self) -> tuple:
+        entry = self.rng.choice(self.queries)
+        language = self.rng.choice(("en", "hi", "kn"))
+        query = entry[language]
+        if self.cache_busting:
+            self.sequence += 1
+            query = f"{query} ({self.sequence})"
+        return language, {"query": query, "language": language}
+
+    async def _request(self, kind: str) -> tuple:
+        """Send one request of `kind`; returns (endpoint label, response)."""
+        if kind in ("chat", "chat_stream"):
+            language, body = self._chat_body()
+            path = "/api/chat" if kind == "chat" else "/api/chat/stream"
+            return f"POST {path} [{language}]", await self.client.post(path, json=body)
+        if kind == "get_alerts":
+            return "GET /api/get-alerts", await self.client.get("/api/get-alerts")
+        if kind == "get_inventory":
+            return "GET /api/worker/get-inventory", await self.client.get("/api/worker/get-inventory", headers=self.headers)
+        body = {"item_name": self.rng.choice(INVENTORY_ITEMS), "quantity": self.rng.randint(0, 500)}
+        return "POST /api/worker/update-inventory", await self.client.post(
+            "/api/worker/update-inventory", json=body, headers=self.headers)
+
+    async def client_loop(self, deadline: float):
+        kinds, weights = zip(*TRAFFIC_MIX.items())
+        while time.perf_counter() < deadline:
+            kind = self.rng.choices(kinds, weights)[0]
+            start = time.perf_counter()
+            try:
+                endpoint, response = await self._request(kind)
+                ok = response.status_code < 400 and "event: error" not in response.text
+                for name, ms in parse_server_timing(response.headers.get("server-timing", "")).items():
+                    self.stages.setdefault(endpoint, {}).setdefault(name, []).append(ms)
+            except Exception:
+                endpoint, ok = kind, False
+            self.samples.setdefault(endpoint, []).append(((time.perf_counter() - start) * 1000, ok))
+
+
+async def run(args) -> dict:
+    with open(EVAL_QUERIES_PATH, encoding="utf-8") as f:
+        queries = json.load(f)
+
+    async with auth.app.router.lifespan_context(auth.app):
+        # The index is built in the background; measure the warm app, not the warm-up
+        start = time.perf_counter()
+        while not auth.rag_ready():
+            if time.perf_counter() - start > args.warmup_timeout:
+                raise RuntimeError("RAG index did not become ready; see the log above")
+            await asyncio.sleep(0.2)
+        print(f"App ready in {time.perf_counter() - start:.1f}s (work dir {WORK_DIR})")
+
+        transport = httpx.ASGITransport(app=auth.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            login = await client.post("/api/worker/login", json={"username": "healthworker", "password": "securepass"})
+            login.raise_for_status()
+            for i in range(5):
+                await client.post("/api/worker/broadcast-alert", json={"message": f"Benchmark alert {i}"},
+                                  headers={"Authorization": f"Bearer {login.json()['access_token']}"})
+
+            generator = LoadGenerator(client, login.json()["access_token"], queries, args.cache_busting, args.seed)
+            print(f"Running {args.concurrency} clients for {args.duration:g}s...")
+            run_start = time.perf_counter()
+            deadline = run_start + args.duration
+            await asyncio.gather(*(generator.client_loop(deadline) for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - run_start
+
+    endpoints = summarize(generator.samples, elapsed, generator.stages)
+    all_records = [record for records in generator.samples.values() for record in records]
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": {
+            "concurrency": args.concurrency, "duration_seconds": args.duration, "seed": args.seed,
+            "cache_busting": args.cache_busting, "traffic_mix": TRAFFIC_MIX,
+            "llm_fake_latency_ms": float(os.environ["LLM_FAKE_LATENCY_MS"]),
+            "embedding_backend": os.environ["EMBEDDING_BACKEND"], "vector_store": os.environ["VECTOR_STORE"],
+        },
+        "total": summarize({"all": all_records}, elapsed)["all"],
+        "endpoints": endpoints,
+    }
+
+def compare(results: dict, baseline_path: str) -> list:
+    """Endpoints whose p95 rose, or throughput fell, beyond the thresholds."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = []
+    for endpoint, current in {"all": results["total"], **results["endpoints"]}.items():
+        previous = baseline["total"] if endpoint == "all" else baseline["endpoints"].get(endpoint)
+        if not previous:
+            continue
+        if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * P95_REGRESSION:
+            regressions.append(f"{endpoint}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+        if current["throughput_rps"] < previous["throughput_rps"] * THROUGHPUT_REGRESSION:
+            regressions.append(f"{endpoint}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} rps")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=20, help="virtual clients")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load after warm-up")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--cache-busting", action="store_true", help="make every chat query unique (no answer cache hits)")
+    parser.add_argument("--warmup-timeout", type=float, default=300)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="baseline results JSON; exit 1 on regression")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    print(f"\n{'endpoint':44} {'reqs':>6} {'err':>4} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for endpoint, s in {**results["endpoints"], "all": results["total"]}.items():
+        print(f"{endpoint:44} {s['requests']:>6} {s['errors']:>4} {s['throughput_rps']:>8} "
+              f"{s['p50_ms']:>8} {s['p95_ms']:>8} {s['p99_ms']:>8}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        regressions = compare(results, args.compare)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+import os
+import json
+import math
+import logging
+import unicodedata
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Common English function words; they carry no retrieval signal and only inflate postings
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how i if in is it its me my no
+not of on or our should so than that the their them there these they this to was we what
+when where which who why will with you your
+""".split())
+
+
+def tokenize(text: str) -> list:
+    """Lower-cased word tokens. Combining marks count as word characters so Devanagari
+    and Kannada words stay whole (Python's \\w would split them at every vowel sign)."""
+    tokens, current = [], []
+    for ch in unicodedata.normalize("NFKC", text).casefold():
+        if ch.isalnum() or unicodedata.category(ch).startswith("M"):
+            current.append(ch)
+        elif current:
+            tokens.append("".join(current))
+            current = []
+    if current:
+        tokens.append("".join(current))
+    return [token for token in tokens if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 inverted index over knowledge base chunks, kept in step with the vector store.
+
+    Chunk text and metadata are stored alongside the postings so a lexical hit can be
+    answered without touching the vector store.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # term -> {chunk_id: term frequency}
+        self.lengths = {}  # chunk_id -> token count
+        self.chunks = {}  # chunk_id -> (text, metadata)
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def __contains__(self, chunk_id):
+        return chunk_id in self.chunks
+
+    def add(self, chunk_id: str, text: str, metadata: dict):
+        if chunk_id in self.chunks:
+            self.remove(chunk_id)
+        tokens = tokenize(text)
+        frequencies = {}
+        for token in tokens:
+            frequencies[token] = frequencies.get(token, 0) + 1
+        for token, tf in frequencies.items():
+            self.postings.setdefault(token, {})[chunk_id] = tf
+        self.lengths[chunk_id] = len(tokens)
+        self.total_length += len(tokens)
+        self.chunks[chunk_id] = (text, metadata)
+
+    def add_many(self, ids: list, texts: list, metadatas: list):
+        for chunk_id, text, metadata in zip(ids, texts, metadatas):
+            self.add(chunk_id, text, metadata)
+
+    def remove(self, chunk_id: str):
+        text, _ = self.chunks.pop(chunk_id, (None, None))
+        if text is None:
+            return
+        for token in set(tokenize(text)):
+            postings = self.postings.get(token)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self.postings[token]
+        self.total_length -= self.lengths.pop(chunk_id)
+
+    def idf(self, term: str) -> float:
+        n = len(self.chunks)
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int = 10) -> list:
+        """Top-k (chunk_id, score) pairs, best first."""
+        if not self.chunks:
+            return []
+        avg_length = self.total_length / len(self.chunks)
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for chunk_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[chunk_id] / avg_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def is_decisive(self, query: str, results: list, k: int, min_idf: float, max_terms: int) -> bool:
+        """True for short keyword queries ("Dengue", "typhoid vaccine") whose every term is
+        rare in the corpus and present in each of the top-k chunks: BM25 alone answers those."""
+        terms = set(tokenize(query))
+        if not terms or len(terms) > max_terms or len(results) < k:
+            return False
+        if any(self.idf(term) < min_idf for term in terms):
+            return False
+        return all(chunk_id in self.postings.get(term, ()) for term in terms for chunk_id, _ in results[:k])
+
+    def save(self, path: Path):
+        # Postings and lengths are rebuilt on load; only the chunks are persisted
+        tmp_path = Path(str(path) + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "chunks": self.chunks}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "BM25Index":
+        index = cls()
+        if not Path(path).exists():
+            return index
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read BM25 index, rebuilding: {e}")
+            return index
+        index.k1, index.b = data.get("k1", index.k1), data.get("b", index.b)
+        for chunk_id, (text, metadata) in data["chunks"].items():
+            index.add(chunk_id, text, metadata)
+        return index
+
+
+def reciprocal_rank_fusion(rankings: list, k: int = 60) -> list:
+    """Fuse several best-first lists of IDs; returns IDs ordered by summed 1 / (k + rank)."""
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
@@ -0,0 +1,178 @@
+import time
+import sqlite3
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(text: str) -> str:
+    """Canonical form of a query for cache keys: NFKC, case-folded, single-spaced, no trailing punctuation."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(text.split()).strip(" ?!.।,;:")
+
+
+class LRUTTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    Entries can carry tags so that a group of them can be dropped together
+    (e.g. every answer that was built from inventory data).
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value, tags)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value, _ = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, tags=(), ttl: float = None):
+        """Store `value`; `ttl` overrides the cache-wide TTL for this entry."""
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value, frozenset(tags))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_tag(self, tag) -> int:
+        """Drop every entry carrying `tag`; returns how many were removed."""
+        with self._lock:
+            stale = [key for key, (_, _, tags) in self._data.items() if tag in tags]
+            for key in stale:
+                del self._data[key]
+            return len(stale)
+
+    def invalidate_where(self, predicate) -> int:
+        """Drop every entry whose key satisfies `predicate(key)`; returns how many were removed."""
+        with self._lock:
+            stale = [key for key in self._data if predicate(key)]
+            for key in stale:
+                del self._data[key]
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class PersistentLRUCache:
+    """Bounded string->string LRU cache mirrored to a small SQLite file so it survives restarts.
+
+    Lookups are served from memory; the file is only written on inserts and
+    evictions, and the most recently inserted entries are reloaded on first use.
+    """
+
+    def __init__(self, path, maxsize: int = 5000):
+        self.path = path
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        # The file is opened on first use, so importing a module that defines a cache
+        # (e.g. seed_db.py importing auth) does not create it
+        self._opened = False
+
+    def _open(self):
+        """Open the file and load the most recent entries. Call with the lock held."""
+        if self._opened:
+            return
+        self._opened = True
+        try:
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL)"
+            )
+            rows = self._conn.execute(
+                "SELECT key, value FROM cache ORDER BY last_used DESC LIMIT ?", (self.maxsize,)
+            ).fetchall()
+            for key, value in reversed(rows):
+                self._data[key] = value
+            # Drop anything beyond the bound (e.g. after maxsize was lowered)
+            self._conn.execute(
+                "DELETE FROM cache WHERE key NOT IN (SELECT key FROM cache ORDER BY last_used DESC LIMIT ?)", (self.maxsize,)
+            )
+            self._conn.commit()
+            logger.info(f"Loaded {len(self._data)} entries from {self.path}")
+        except sqlite3.Error as e:
+            # The cache is an optimisation: fall back to memory only
+            logger.error(f"Persistent cache unavailable, using memory only: {e}")
+            self._conn = None
+
+    def get(self, key: str):
+        with self._lock:
+            self._open()
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._open()
+            self._data[key] = value
+            self._data.move_to_end(key)
+            evicted = []
+            while len(self._data) > self.maxsize:
+                evicted.append(self._data.popitem(last=False)[0])
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, last_used) VALUES (?, ?, ?)", (key, value, time.time())
+                )
+                if evicted:
+                    self._conn.executemany("DELETE FROM cache WHERE key = ?", [(k,) for k in evicted])
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to persist cache entry: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._open()
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
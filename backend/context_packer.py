@@ -0,0 +1,80 @@
+import os
+import re
+import math
+from bm25 import tokenize
+
+# --- Context packing (override via environment) ---
+# Token budget for the CONTEXT section of the chat prompt (inventory rows + knowledge base text).
+# 400 is about what three whole 500-character chunks used to take.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 400))
+# Chunks retrieved for packing; the budget, not this, decides how much text reaches the prompt
+CONTEXT_CANDIDATE_CHUNKS = int(os.getenv("CONTEXT_CANDIDATE_CHUNKS", 5))
+# MMR trade-off: 1.0 ranks sentences by relevance alone, lower values favour covering new ground
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", 0.7))
+# Cap on inventory rows listed for a general stock question ("what is in stock?")
+INVENTORY_CONTEXT_MAX_ROWS = int(os.getenv("INVENTORY_CONTEXT_MAX_ROWS", 25))
+
+# Sentences this similar (Jaccard over terms) to one already packed are skipped outright
+NEAR_DUPLICATE_SENTENCE = 0.8
+
+# Sentence ends: Latin punctuation, the Devanagari danda, and line breaks
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?।])\s+|\n+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough subword token count without a tokenizer round-trip: one token per short word,
+    one more per six characters of longer words, and one per punctuation mark."""
+    return sum(1 + len(piece) // 6 if piece[0].isalnum() else 1 for piece in re.findall(r"\w+|[^\w\s]", text))
+
+def split_sentences(text: str) -> list:
+    return [sentence.strip() for sentence in SENTENCE_BOUNDARY.split(text) if sentence.strip()]
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def pack_chunks(query: str, chunks: list, budget: int, mmr_lambda: float = CONTEXT_MMR_LAMBDA) -> str:
+    """Fit retrieved chunks (best first) into `budget` tokens.
+
+    If they already fit they are returned whole. Otherwise sentences are picked greedily
+    by maximal marginal relevance: overlap with the query's terms, nudged by the rank of
+    the chunk they came from, minus their similarity to sentences already picked (so
+    overlapping chunks do not repeat each other). Picked sentences keep their original
+    order, grouped by chunk.
+    """
+    full = "\n\n".join(chunks)
+    if estimate_tokens(full) <= budget or budget <= 0:
+        return full if budget > 0 else ""
+
+    query_terms = set(tokenize(query))
+    candidates = []  # (chunk rank, position, sentence, terms, tokens, relevance)
+    for rank, chunk in enumerate(chunks):
+        for position, sentence in enumerate(split_sentences(chunk)):
+            terms = set(tokenize(sentence))
+            overlap = len(terms & query_terms) / math.sqrt(len(terms)) if terms else 0.0
+            # Rank prior breaks ties (and carries paraphrased matches with no shared terms)
+            relevance = overlap + 0.1 / (1 + rank) + 0.01 / (1 + position)
+            candidates.append((rank, position, sentence, terms, estimate_tokens(sentence), relevance))
+
+    def redundancy(candidate):
+        return max((_jaccard(candidate[3], s[3]) for s in selected), default=0.0)
+
+    selected, used = [], 0
+    while candidates:
+        best = max(candidates, key=lambda c: mmr_lambda * c[5] - (1 - mmr_lambda) * redundancy(c))
+        candidates.remove(best)
+        # Adjacent chunks overlap by CHUNK_OVERLAP characters, so the same sentence often
+        # appears twice; a near-copy adds nothing at any budget
+        if used + best[4] <= budget and redundancy(best) < NEAR_DUPLICATE_SENTENCE:
+            selected.append(best)
+            used += best[4]
+
+    selected.sort(key=lambda c: (c[0], c[1]))
+    parts, current_rank = [], None
+    for rank, _, sentence, _, _, _ in selected:
+        if rank == current_rank:
+            parts[-1] += " " + sentence
+        else:
+            parts.append(sentence)
+            current_rank = rank
+    return "\n\n".join(parts)
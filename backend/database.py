@@ -0,0 +1,81 @@
+import os
+import logging
+from pathlib import Path
+from sqlalchemy import event, inspect
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlmodel import SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+DB_PATH = Path(os.getenv("DATABASE_PATH", ROOT_DIR / "health_chatbot.db"))
+DATABASE_URL = f"sqlite:///{DB_PATH}"
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{DB_PATH}"
+
+# WAL lets readers (get_alerts, get_inventory) keep reading while a writer commits;
+# busy_timeout makes concurrent writers queue instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",  # safe with WAL, one fsync per checkpoint instead of per commit
+    "busy_timeout": 5000,
+    "cache_size": -16000,  # 16 MB page cache per connection
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {pragma}={value}")
+    cursor.close()
+
+# Sync engine: table creation and scripts such as seed_db.py
+engine = create_engine(DATABASE_URL, echo=False, connect_args={"check_same_thread": False})
+event.listen(engine, "connect", _apply_sqlite_pragmas)
+
+# Async engine: every request handler. aiosqlite runs each connection on its own
+# thread, so a slow commit never blocks the event loop.
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=False,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=int(os.getenv("DB_POOL_SIZE", 10)),
+    max_overflow=int(os.getenv("DB_MAX_OVERFLOW", 10)),
+    pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", 30)),
+)
+event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+
+async_session_maker = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def _add_missing_columns(connection):
+    """Additive migration: create_all() creates missing tables but never alters existing
+    ones, so columns added to a model later are added here. Such columns must be nullable
+    or have a server_default."""
+    inspector = inspect(connection)
+    for table in SQLModel.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(connection.dialect)}"
+            if column.server_default is not None:
+                default = column.server_default.arg
+                ddl += f" DEFAULT {getattr(default, 'text', default)}"
+            if not column.nullable:
+                ddl += " NOT NULL"
+            connection.exec_driver_sql(ddl)
+            logger.info(f"Added column {table.name}.{column.name}")
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+def create_db_and_tables():
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as connection:
+        _add_missing_columns(connection)
+
+async def get_session():
+    async with async_session_maker() as session:
+        yield session
@@ -0,0 +1,129 @@
+import os
+import re
+import zlib
+import hashlib
+import logging
+import unicodedata
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# --- Deduplication tuning (override via environment) ---
+INGEST_DEDUP = os.getenv("INGEST_DEDUP", "1") == "1"
+# Estimated Jaccard similarity (over word 3-gram shingles) above which two chunks count as duplicates
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", 0.85))
+# 16 bands of 8 rows: pairs at 0.85 similarity become LSH candidates ~99% of the time,
+# pairs at 0.5 under 7%; candidates are then checked against the full signature.
+DEDUP_NUM_PERM = 128
+DEDUP_BANDS = 16
+SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def normalize_chunk(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+def shingle_hashes(normalized: str) -> np.ndarray:
+    words = re.findall(r"\w+", normalized)
+    if len(words) < SHINGLE_SIZE:
+        shingles = {" ".join(words) or normalized}
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+
+class ChunkDeduplicator:
+    """Drops exact and near-duplicate chunks before they are embedded.
+
+    Exact duplicates are caught by a hash of the whitespace- and case-normalized text,
+    near duplicates by MinHash signatures bucketed with LSH banding. Every chunk that is
+    kept is added to the index, so later chunks (in this file or any other) are compared
+    against it; seed it with the chunks already in the store for incremental runs.
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, num_perm: int = DEDUP_NUM_PERM, bands: int = DEDUP_BANDS):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        # Fixed seed: the same text always gets the same signature
+        rng = np.random.RandomState(1)
+        self._a = rng.randint(1, 1 << 61, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 61, size=num_perm, dtype=np.uint64)
+        self._exact = {}  # text digest -> chunk_id
+        self._buckets = {}  # (band, band hash) -> [chunk_id]
+        self._signatures = {}  # chunk_id -> signature
+        self.stats = {"seen": 0, "exact": 0, "near": 0}
+
+    def _signature(self, normalized: str) -> np.ndarray:
+        hashes = shingle_hashes(normalized)
+        # Universal hashing mod 2^64 then the Mersenne prime, as in datasketch's MinHash
+        permuted = ((hashes[:, None] * self._a + self._b) % _MERSENNE_PRIME) & _MAX_HASH
+        return permuted.min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> list:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def fingerprint(self, text: str) -> tuple:
+        """(exact digest, MinHash signature) of a chunk's normalized text."""
+        normalized = normalize_chunk(text)
+        return hashlib.sha1(normalized.encode("utf-8")).digest(), self._signature(normalized)
+
+    def find(self, digest: bytes, signature: np.ndarray) -> tuple:
+        """("exact" | "near", canonical chunk ID) for an indexed duplicate, else (None, None)."""
+        if digest in self._exact:
+            return "exact", self._exact[digest]
+        candidates = {cid for key in self._band_keys(signature) for cid in self._buckets.get(key, ())}
+        for candidate in sorted(candidates):
+            if np.mean(self._signatures[candidate] == signature) >= self.threshold:
+                return "near", candidate
+        return None, None
+
+    def add(self, chunk_id: str, digest: bytes, signature: np.ndarray):
+        self._exact.setdefault(digest, chunk_id)
+        self._signatures[chunk_id] = signature
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, []).append(chunk_id)
+
+    def add_many(self, ids: list, texts: list):
+        """Index chunks that are already stored, without filtering them."""
+        for chunk_id, text in zip(ids, texts):
+            self.add(chunk_id, *self.fingerprint(text))
+
+    def filter(self, result: dict) -> dict:
+        """Remove duplicate chunks from a split_pages result (with chunk IDs assigned).
+
+        Returns a copy holding only the kept chunks, plus `duplicates`: {dropped chunk ID:
+        canonical chunk ID}, so the dropped chunk's source is still on record.
+        """
+        kept = {"ids": [], "texts": [], "metadatas": []}
+        duplicates = {}
+        for chunk_id, text, metadata in zip(result["ids"], result["texts"], result["metadatas"]):
+            self.stats["seen"] += 1
+            if chunk_id in self._signatures:
+                # Stored by an interrupted run that is being resumed: chunk IDs are
+                # deterministic, so this is the chunk itself and it stays on record
+                kept["ids"].append(chunk_id)
+                kept["texts"].append(text)
+                kept["metadatas"].append(metadata)
+                continue
+            digest, signature = self.fingerprint(text)
+            kind, canonical = self.find(digest, signature)
+            if kind:
+                self.stats[kind] += 1
+                duplicates[chunk_id] = canonical
+                continue
+            self.add(chunk_id, digest, signature)
+            kept["ids"].append(chunk_id)
+            kept["texts"].append(text)
+            kept["metadatas"].append(metadata)
+        return {**result, **kept, "duplicates": duplicates}
+
+    def log_stats(self):
+        removed = self.stats["exact"] + self.stats["near"]
+        share = removed / self.stats["seen"] if self.stats["seen"] else 0.0
+        logger.info(
+            f"Deduplication removed {removed} of {self.stats['seen']} chunks ({share:.1%}): "
+            f"{self.stats['exact']} exact, {self.stats['near']} near duplicates"
+        )
@@ -0,0 +1,91 @@
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+# --- Micro-batching tuning (override via environment) ---
+# How long the first query in a batch waits for company, and the batch cap.
+# MiniLM on CPU is several times faster per query at batch 16-32 than at batch 1.
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", 5))
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", 32))
+
+
+class MicroBatchEmbedder(Embeddings):
+    """Wraps an Embeddings model so concurrent `embed_query` calls share one forward pass.
+
+    Callers block on a Future while a single background thread collects the
+    queries that arrive within `window_ms` (or until `max_batch_size`), embeds
+    them with one `embed_documents` call and hands each vector back.
+    `embed_documents` (ingestion) is passed straight through.
+    """
+
+    def __init__(self, embeddings: Embeddings, window_ms: float = EMBED_BATCH_WINDOW_MS,
+                 max_batch_size: int = EMBED_MAX_BATCH_SIZE):
+        self.embeddings = embeddings
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes = {}  # batch size -> number of batches of that size
+        self._requests = 0
+        self._max_queue_depth = 0
+        self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+        self._thread.start()
+
+    def embed_documents(self, texts: list) -> list:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list:
+        future = Future()
+        self._queue.put((text, future))
+        with self._lock:
+            self._requests += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+        return future.result()
+
+    def _collect_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            with self._lock:
+                self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+            try:
+                vectors = self.embeddings.embed_documents([text for text, _ in batch])
+            except Exception as e:
+                logger.error(f"Batched query embedding failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def stats(self) -> dict:
+        """Queue depth and batch-size distribution, for logs and metrics."""
+        with self._lock:
+            batches = sum(self._batch_sizes.values())
+            embedded = sum(size * count for size, count in self._batch_sizes.items())
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "requests": self._requests,
+                "batches": batches,
+                "mean_batch_size": embedded / batches if batches else 0.0,
+                "batch_sizes": dict(sorted(self._batch_sizes.items())),
+            }
@@ -0,0 +1,88 @@
+import os
+import math
+import zlib
+import logging
+import unicodedata
+from langchain_core.embeddings import Embeddings
+from ingest import EMBED_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# --- Embedding backend selection (override via environment) ---
+#   torch  - sentence-transformers on PyTorch (the original path)
+#   onnx   - the same model, int8-quantized, on ONNX Runtime (much lighter on small CPU VMs)
+#   hashed - deterministic hashed character n-grams; no model download, for tests and CI
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+# Quantized exports shipped in the model repo: onnx/model_quint8_avx2.onnx runs on any
+# x86-64 CPU from the last decade; onnx/model_qint8_avx512_vnni.onnx is faster where supported.
+ONNX_MODEL_FILE = os.getenv("ONNX_MODEL_FILE", "onnx/model_quint8_avx2.onnx")
+HASHED_EMBEDDING_DIM = int(os.getenv("HASHED_EMBEDDING_DIM", 384))
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "hashed")
+
+
+class HashedNgramEmbeddings(Embeddings):
+    """Feature-hashed character n-gram vectors (L2-normalized).
+
+    Deterministic across processes and machines (crc32, not Python's salted hash),
+    so indexes built in CI are reproducible. Only lexical overlap is captured, which
+    is enough to exercise retrieval end to end without downloading a model.
+    """
+
+    def __init__(self, dim: int = HASHED_EMBEDDING_DIM, ngram_range: tuple = (3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def _embed(self, text: str) -> list:
+        vector = [0.0] * self.dim
+        text = unicodedata.normalize("NFKC", text).casefold()
+        for word in text.split():
+            padded = f" {word} "
+            for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+                for i in range(max(1, len(padded) - n + 1)):
+                    h = zlib.crc32(padded[i:i + n].encode("utf-8"))
+                    # Low bits pick the dimension, one high bit picks the sign
+                    vector[h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector))
+        return [v / norm for v in vector] if norm else vector
+
+    def embed_documents(self, texts: list) -> list:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list:
+        return self._embed(text)
+
+
+def embedding_backend_id(backend: str = None) -> str:
+    """Identifies the vector space; an index built with one ID cannot be queried with another."""
+    backend = backend or EMBEDDING_BACKEND
+    if backend == "onnx":
+        return f"onnx:{EMBEDDING_MODEL_NAME}:{ONNX_MODEL_FILE}"
+    if backend == "hashed":
+        return f"hashed:{HASHED_EMBEDDING_DIM}"
+    return f"torch:{EMBEDDING_MODEL_NAME}"
+
+def get_embeddings(backend: str = None) -> Embeddings:
+    """Build the embedding model for `backend` (default: EMBEDDING_BACKEND)."""
+    backend = backend or EMBEDDING_BACKEND
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}', expected one of {EMBEDDING_BACKENDS}")
+    logger.info(f"Loading embeddings backend: {embedding_backend_id(backend)}")
+
+    if backend == "hashed":
+        return HashedNgramEmbeddings()
+
+    # Imported lazily: the hashed backend must work without torch installed
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    if backend == "onnx":
+        return HuggingFaceEmbeddings(
+            model_name=EMBEDDING_MODEL_NAME,
+            model_kwargs={'device': 'cpu', 'backend': 'onnx', 'model_kwargs': {'file_name': ONNX_MODEL_FILE}},
+            encode_kwargs={'batch_size': EMBED_BATCH_SIZE}
+        )
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME,
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'batch_size': EMBED_BATCH_SIZE}
+    )
@@ -0,0 +1,121 @@
+"""Compare direct multilingual retrieval with translate-first retrieval, offline.
+
+Usage (from backend/):
+    python eval_multilingual.py                          # EMBEDDING_BACKEND, reference translations
+    python eval_multilingual.py --translate llm --k 3 --output eval_multilingual.json
+
+Retrieval: for every query in retrieval_eval_queries.json, recall@k is measured three ways:
+  en         - the English query (the ceiling)
+  direct     - the Hindi / Kannada query embedded as typed (RETRIEVAL_LANGUAGE_MODE=direct)
+  translated - the query translated to English first (RETRIEVAL_LANGUAGE_MODE=translate).
+               With --translate reference the dataset's English text stands in for the
+               translation (an upper bound that needs no API key); --translate llm asks
+               the configured LLM_BACKEND, as the chat endpoint does.
+
+Inventory: inventory_eval_queries.json checks that general stock questions and item names
+are recognised in the untranslated query.
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from pathlib import Path
+
+from bench_embeddings import EVAL_QUERIES_PATH, load_corpus, normalize, top_k
+from embeddings import EMBEDDING_BACKEND, EMBEDDING_BACKENDS, get_embeddings
+from inventory_index import InventoryIndex
+from language import translation_prompt
+
+INVENTORY_EVAL_PATH = Path(__file__).parent / "inventory_eval_queries.json"
+LANGUAGES = ("hi", "kn")
+# The items seeded at startup (auth.lifespan)
+SEEDED_ITEMS = ["Tetanus Vaccine", "Paracetamol", "Bandages", "Antiseptic Solution", "Thermometers"]
+
+
+def recall(hits, sources: list, queries: list) -> float:
+    return sum(any(sources[i] == q["source"] for i in row) for row, q in zip(hits, queries)) / len(queries)
+
+def translate_all(texts: list) -> tuple:
+    """Translate with the LLM gateway; returns (translations, per-query latency in ms)."""
+    from llm_gateway import llm_gateway
+
+    async def run():
+        translations, latencies = [], []
+        for text in texts:
+            start = time.perf_counter()
+            translated = await llm_gateway.generate(translation_prompt(text))
+            latencies.append((time.perf_counter() - start) * 1000)
+            translations.append(translated.strip().split("\n")[0])
+        return translations, latencies
+    return asyncio.run(run())
+
+def eval_retrieval(backend: str, k: int, translate: str) -> dict:
+    with open(EVAL_QUERIES_PATH, encoding="utf-8") as f:
+        queries = json.load(f)
+    texts, sources = load_corpus()
+    embeddings = get_embeddings(backend)
+    matrix = normalize(embeddings.embed_documents(texts))
+
+    def search(query_texts: list) -> tuple:
+        latencies = []
+        vectors = []
+        for text in query_texts:
+            start = time.perf_counter()
+            vectors.append(embeddings.embed_query(text))
+            latencies.append((time.perf_counter() - start) * 1000)
+        return top_k(matrix, normalize(vectors), k), statistics.median(latencies)
+
+    hits, embed_ms = search([q["en"] for q in queries])
+    results = {"en": {f"recall_at_{k}": round(recall(hits, sources, queries), 3), "embed_ms_p50": round(embed_ms, 2)}}
+    for language in LANGUAGES:
+        direct_hits, direct_ms = search([q[language] for q in queries])
+        if translate == "llm":
+            translations, translate_ms = translate_all([q[language] for q in queries])
+        else:
+            translations, translate_ms = [q["en"] for q in queries], [0.0]
+        translated_hits, translated_ms = search(translations)
+        results[language] = {
+            f"direct_recall_at_{k}": round(recall(direct_hits, sources, queries), 3),
+            f"translated_recall_at_{k}": round(recall(translated_hits, sources, queries), 3),
+            "direct_ms_p50": round(direct_ms, 2),
+            "translated_ms_p50": round(translated_ms + statistics.median(translate_ms), 2),
+        }
+    return {"backend": backend, "k": k, "translate": translate, "queries": len(queries), "chunks": len(texts), **results}
+
+def eval_inventory() -> dict:
+    with open(INVENTORY_EVAL_PATH, encoding="utf-8") as f:
+        cases = json.load(f)
+    index = InventoryIndex()
+    index.load([(name, 1) for name in SEEDED_ITEMS])
+    by_language = {}
+    for case in cases:
+        stats = by_language.setdefault(case["language"], {"queries": 0, "general_correct": 0, "items_correct": 0, "misses": []})
+        general = index.is_general_query(case["query"], case["language"])
+        items = sorted(name for name, _ in index.match(case["query"], case["language"]))
+        stats["queries"] += 1
+        stats["general_correct"] += general == case["general"]
+        stats["items_correct"] += items == sorted(case["items"])
+        if general != case["general"] or items != sorted(case["items"]):
+            stats["misses"].append({"query": case["query"], "general": general, "items": items})
+    return by_language
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default=EMBEDDING_BACKEND, choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--translate", default="reference", choices=("reference", "llm"))
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = {"retrieval": eval_retrieval(args.backend, args.k, args.translate), "inventory": eval_inventory()}
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\nResults written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+import os
+import time
+import threading
+
+# Subsystem states
+PENDING = "pending"
+STARTING = "starting"
+READY = "ready"
+FAILED = "failed"
+DISABLED = "disabled"
+
+# Subsystems that must be ready before /api/health/ready returns 200. By default the app
+# reports ready as soon as it can serve chat (inventory-only until the RAG index is up);
+# add "embeddings,vector_store" to keep a rolling restart from routing traffic before then.
+READY_REQUIRES = [name.strip() for name in os.getenv("HEALTH_READY_REQUIRES", "database,inventory_index").split(",") if name.strip()]
+
+
+class Readiness:
+    """Thread-safe registry of each subsystem's startup state, for the health endpoints."""
+
+    def __init__(self, subsystems: tuple):
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+        self._states = {name: {"state": PENDING, "since": self._started_at, "detail": None} for name in subsystems}
+
+    def set(self, name: str, state: str, detail: str = None):
+        with self._lock:
+            self._states[name] = {"state": state, "since": time.time(), "detail": detail}
+
+    def is_ready(self, *names: str) -> bool:
+        with self._lock:
+            return all(self._states.get(name, {}).get("state") == READY for name in names)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            subsystems = {
+                name: {**entry, "seconds_in_state": round(time.time() - entry["since"], 3)}
+                for name, entry in self._states.items()
+            }
+        return {"uptime_seconds": round(time.time() - self._started_at, 3), "subsystems": subsystems}
+
+
+# Global readiness registry
+readiness = Readiness(("database", "inventory_index", "llm", "embeddings", "vector_store"))
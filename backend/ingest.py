@@ -0,0 +1,266 @@
+import os
+import time
+import logging
+import multiprocessing
+from collections import deque
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from pypdf import PdfReader
+from langchain_community.document_loaders import TextLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+logger = logging.getLogger(__name__)
+
+# --- Ingestion tuning (override via environment) ---
+# Parse/split worker processes. Loading PDFs is CPU-bound pure Python, so this scales with cores.
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", min(8, os.cpu_count() or 1)))
+# Chunks per embedder forward pass. 32 keeps MiniLM on CPU near peak throughput
+# without padding waste from long tail sequences.
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 32))
+# Chunks per vector store write. Must stay below Chroma's max batch size (~5k).
+STORE_BATCH_SIZE = int(os.getenv("STORE_BATCH_SIZE", 512))
+# PDFs are parsed in page ranges of this size, so a large guideline is split across
+# workers and no parse task holds more than this many pages of text.
+INGEST_PAGES_PER_TASK = int(os.getenv("INGEST_PAGES_PER_TASK", 32))
+# Parse tasks queued or running per worker ahead of the embedder. Together with the two
+# sizes above this bounds the parsed text and vectors in flight (see IngestionPipeline).
+INGEST_PARSE_AHEAD = int(os.getenv("INGEST_PARSE_AHEAD", 2))
+# Progress through a partly indexed file is checkpointed at most this often
+INGEST_CHECKPOINT_SECONDS = float(os.getenv("INGEST_CHECKPOINT_SECONDS", 30))
+
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+SEPARATORS = ["\n\n", "\n", ". ", " ", ""]
+
+
+def make_chunk_id(rel_path: str, sha256: str, index: int) -> str:
+    """Stable chunk ID: the same file content always produces the same IDs."""
+    return f"{rel_path}::{sha256[:16]}::{index}"
+
+def count_pages(path: Path) -> int:
+    """Pages in a PDF; text files are loaded as a single page."""
+    if path.suffix.lower() == ".pdf":
+        return len(PdfReader(str(path)).pages)
+    return 1
+
+def load_pages(path: Path, start: int, end: int):
+    """Yield (text, metadata) for pages [start, end) of a knowledge base file, one page at a time."""
+    if path.suffix.lower() == ".pdf":
+        # Same text and page metadata as PyPDFLoader, without materialising every page
+        reader = PdfReader(str(path))
+        total = len(reader.pages)
+        for page in range(start, min(end, total)):
+            yield reader.pages[page].extract_text() or "", {"source": str(path), "page": page, "total_pages": total}
+        return
+    for doc in TextLoader(str(path), autodetect_encoding=True).lazy_load():
+        yield doc.page_content, doc.metadata
+
+def split_pages(base_dir: str, rel_path: str, start: int, end: int, last: bool) -> dict:
+    """Parse and chunk pages [start, end) of one file. Runs inside a worker process, so it only
+    returns plain data. Chunks never span pages, so splitting page by page gives the same
+    chunks as splitting the whole document."""
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        separators=SEPARATORS
+    )
+    pages, texts, metadatas = 0, [], []
+    for text, metadata in load_pages(Path(base_dir) / rel_path, start, end):
+        pages += 1
+        for chunk in text_splitter.split_text(text):
+            texts.append(chunk)
+            metadatas.append(dict(metadata))
+    return {"rel_path": rel_path, "end": end, "last": last, "num_docs": pages, "texts": texts, "metadatas": metadatas}
+
+def plan_tasks(base_dir: Path, files: dict, resume: dict = None) -> list:
+    """(rel_path, start page, end page, last) parse tasks for `files`, in file order.
+
+    Files in `resume` ({rel_path: {"pages_done": n, ...}}) start after their checkpointed
+    pages. Every file gets at least one task, so even an empty one completes.
+    """
+    resume = resume or {}
+    tasks = []
+    for rel_path in files:
+        total = count_pages(base_dir / rel_path)
+        first = min(resume.get(rel_path, {}).get("pages_done", 0), total)
+        starts = list(range(first, total, INGEST_PAGES_PER_TASK)) or [first]
+        for start in starts:
+            end = min(start + INGEST_PAGES_PER_TASK, total)
+            tasks.append((rel_path, start, end, end >= total))
+    return tasks
+
+def parse_files(base_dir: Path, files: dict, workers: int = INGEST_WORKERS, resume: dict = None):
+    """Yield split_pages results for every file, in order, using a process pool when it pays off.
+
+    At most INGEST_PARSE_AHEAD tasks per worker are queued or running at once, so parsing
+    never runs far ahead of the consumer.
+    """
+    tasks = plan_tasks(base_dir, files, resume)
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield split_pages(str(base_dir), *task)
+        return
+    # "spawn" keeps workers from inheriting the parent's torch/OpenMP state
+    ctx = multiprocessing.get_context("spawn")
+    workers = min(workers, len(tasks))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(split_pages, str(base_dir), *task))
+            if len(pending) >= workers * INGEST_PARSE_AHEAD:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class IngestionPipeline:
+    """Streams files through parse (pages, in parallel) -> chunk -> embedding batch -> store write.
+
+    Parsed text and vectors in flight are bounded by the parse-ahead window and one store
+    batch, so a large PDF is never held whole. Memory is still not independent of corpus
+    size: the BM25 index (every chunk's text, plus postings) and the deduplicator (a
+    MinHash signature per chunk, about 1 KB) grow with every chunk indexed, the BM25 index
+    is serialized in one piece at the end, and the mmap store stages all its rows until
+    flush. Only the Chroma collection is written through.
+
+    Progress through a large file is checkpointed, so an interrupted build resumes from
+    the last checkpointed page instead of the start of the file.
+    """
+
+    def __init__(self, vectorstore, embeddings, embed_batch_size: int = EMBED_BATCH_SIZE,
+                 store_batch_size: int = STORE_BATCH_SIZE, workers: int = INGEST_WORKERS,
+                 lexical_index=None, deduplicator=None, checkpoint_seconds: float = INGEST_CHECKPOINT_SECONDS):
+        self.vectorstore = vectorstore
+        self.embeddings = embeddings
+        # Optional BM25Index fed the same chunks, so lexical and vector search stay in step
+        self.lexical_index = lexical_index
+        # Optional ChunkDeduplicator: duplicate chunks are recorded but never embedded or stored
+        self.deduplicator = deduplicator
+        self.embed_batch_size = embed_batch_size
+        self.store_batch_size = store_batch_size
+        self.workers = workers
+        self.checkpoint_seconds = checkpoint_seconds
+
+    def _embed(self, texts: list) -> list:
+        vectors = []
+        for start in range(0, len(texts), self.embed_batch_size):
+            vectors.extend(self.embeddings.embed_documents(texts[start:start + self.embed_batch_size]))
+        return vectors
+
+    def _write(self, ids: list, texts: list, metadatas: list):
+        vectors = self._embed(texts)
+        if hasattr(self.vectorstore, "upsert_embeddings"):
+            # MmapVectorStore takes precomputed vectors directly
+            self.vectorstore.upsert_embeddings(ids, vectors, texts, metadatas)
+        else:
+            # Upsert straight into the collection: the vectors are already computed,
+            # and upsert keeps a re-run after an interrupted build idempotent.
+            self.vectorstore._collection.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+        if self.lexical_index is not None:
+            self.lexical_index.add_many(ids, texts, metadatas)
+
+    def run(self, base_dir: Path, files: dict, on_file_indexed=None, resume: dict = None, on_checkpoint=None) -> dict:
+        """Index `files` ({rel_path: sha256}).
+
+        `on_file_indexed(rel_path, chunk_ids, duplicates)` fires once a file is fully stored;
+        `duplicates` maps each of its chunks that was dropped to the stored chunk it duplicates.
+        `on_checkpoint(rel_path, progress)` fires every `checkpoint_seconds` for files that are
+        partly stored; pass a saved `progress` back in `resume` ({rel_path: progress}) to
+        continue such a file after its stored pages.
+        """
+        stats = {"files": 0, "docs": 0, "chunks": 0, "duplicates": 0, "embed_seconds": 0.0}
+        run_start = time.perf_counter()
+        ids, texts, metadatas = [], [], []
+        # Per file being indexed: pages, chunk IDs and duplicates stored so far, and the next chunk index
+        progress = {}
+        for rel_path in files:
+            saved = (resume or {}).get(rel_path, {})
+            progress[rel_path] = {
+                "pages_done": saved.get("pages_done", 0),
+                "next_index": saved.get("next_index", 0),
+                "chunk_ids": list(saved.get("chunk_ids", [])),
+                "duplicates": dict(saved.get("duplicates", {})),
+            }
+        next_index = {rel_path: entry["next_index"] for rel_path, entry in progress.items()}
+        # Parsed page ranges whose chunks are not all written yet:
+        # (rel_path, end page, last, chunk_ids, duplicates, chunk offset at end of the range)
+        open_ranges = deque()
+        written = 0
+        last_checkpoint = time.monotonic()
+        dirty = set()
+
+        def checkpoint():
+            nonlocal last_checkpoint
+            last_checkpoint = time.monotonic()
+            partial = [rel_path for rel_path in dirty if rel_path in progress]
+            dirty.clear()
+            if not partial or on_checkpoint is None:
+                return
+            # A checkpoint must not claim chunks the store could still lose
+            if hasattr(self.vectorstore, "flush"):
+                self.vectorstore.flush()
+            for rel_path in partial:
+                on_checkpoint(rel_path, progress[rel_path])
+
+        def write_batch(n: int):
+            nonlocal written
+            if n:
+                write_start = time.perf_counter()
+                self._write(ids[:n], texts[:n], metadatas[:n])
+                stats["embed_seconds"] += time.perf_counter() - write_start
+                del ids[:n], texts[:n], metadatas[:n]
+                written += n
+            while open_ranges and open_ranges[0][5] <= written:
+                rel_path, end, last, chunk_ids, duplicates, _ = open_ranges.popleft()
+                entry = progress[rel_path]
+                entry["pages_done"] = end
+                entry["next_index"] += len(chunk_ids) + len(duplicates)
+                entry["chunk_ids"].extend(chunk_ids)
+                entry["duplicates"].update(duplicates)
+                if last:
+                    stats["files"] += 1
+                    del progress[rel_path]
+                    if on_file_indexed:
+                        on_file_indexed(rel_path, entry["chunk_ids"], entry["duplicates"])
+                else:
+                    dirty.add(rel_path)
+            if dirty and time.monotonic() - last_checkpoint >= self.checkpoint_seconds:
+                checkpoint()
+
+        # Workers keep parsing ahead while the parent embeds, so both stages overlap
+        for result in parse_files(base_dir, files, self.workers, resume):
+            rel_path = result["rel_path"]
+            # Chunk IDs number a file's chunks in order, as if it had been split in one go
+            result["ids"] = []
+            for metadata in result["metadatas"]:
+                chunk_id = make_chunk_id(rel_path, files[rel_path], next_index[rel_path])
+                next_index[rel_path] += 1
+                result["ids"].append(chunk_id)
+                metadata["chunk_id"] = chunk_id
+            stats["docs"] += result["num_docs"]
+            stats["chunks"] += len(result["ids"])
+            if self.deduplicator is not None:
+                result = self.deduplicator.filter(result)
+                stats["duplicates"] += len(result["duplicates"])
+            ids.extend(result["ids"])
+            texts.extend(result["texts"])
+            metadatas.extend(result["metadatas"])
+            open_ranges.append((
+                rel_path, result["end"], result["last"], result["ids"], result.get("duplicates", {}), written + len(ids)
+            ))
+            # Store batches may hold several small files or only part of a large one
+            while len(ids) >= self.store_batch_size:
+                write_batch(self.store_batch_size)
+        write_batch(len(ids))
+
+        stats["seconds"] = time.perf_counter() - run_start
+        stats["docs_per_sec"] = stats["docs"] / stats["seconds"] if stats["seconds"] else 0.0
+        stats["chunks_per_sec"] = stats["chunks"] / stats["seconds"] if stats["seconds"] else 0.0
+        logger.info(
+            f"Ingested {stats['files']} files ({stats['docs']} pages, {stats['chunks']} chunks) "
+            f"in {stats['seconds']:.1f}s: {stats['docs_per_sec']:.1f} pages/sec, "
+            f"{stats['chunks_per_sec']:.1f} chunks/sec ({stats['embed_seconds']:.1f}s embedding and storing)"
+        )
+        if self.deduplicator is not None:
+            self.deduplicator.log_stats()
+        return stats
@@ -0,0 +1,158 @@
+import os
+import csv
+import json
+import codecs
+import tempfile
+from typing import AsyncIterator, Iterator, Optional
+
+# --- Bulk inventory import (override via environment) ---
+# Rows per INSERT ... ON CONFLICT statement: each row binds three parameters (item_name,
+# quantity, version), so keep this at 333 or below to stay under SQLite's 999-variable
+# limit on older builds.
+BULK_UPSERT_BATCH_SIZE = int(os.getenv("BULK_UPSERT_BATCH_SIZE", 300))
+# Upper bound on rows per import, which also bounds the per-row results in the response
+BULK_INVENTORY_MAX_ROWS = int(os.getenv("BULK_INVENTORY_MAX_ROWS", 50000))
+MAX_ITEM_NAME_LENGTH = 200
+# Validated rows are spooled to disk beyond this, so a large upload never sits in memory
+SPOOL_MAX_BYTES = 1 << 20
+
+CSV_COLUMNS = ("item_name", "quantity")
+
+
+class InventoryImportError(ValueError):
+    pass
+
+
+def validate_row(item_name, quantity) -> tuple:
+    """(clean item name, quantity) or raises ValueError with a message for the results."""
+    if not isinstance(item_name, str) or not item_name.strip():
+        raise ValueError("item_name is required")
+    item_name = " ".join(item_name.split())
+    if len(item_name) > MAX_ITEM_NAME_LENGTH:
+        raise ValueError(f"item_name is longer than {MAX_ITEM_NAME_LENGTH} characters")
+    if isinstance(quantity, str):
+        quantity = quantity.strip()
+        quantity = int(quantity) if quantity.lstrip("-").isdigit() else quantity
+    if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity < 0:
+        raise ValueError("quantity must be a non-negative integer")
+    return item_name, quantity
+
+
+async def iter_text_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream as UTF-8 (BOM tolerated) and yield it line by line, newline included."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def iter_csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple]:
+    """(row number, [fields]) for each CSV record in a byte stream, one record in memory at a time.
+
+    A record is complete once its quote count is even, so quoted fields may span lines;
+    an unterminated quote at the end comes through as (row, None). Row numbers count
+    records, header included, starting at 1.
+    """
+    record, row = "", 0
+    async for line in iter_text_lines(chunks):
+        record += line
+        if record.count('"') % 2:
+            continue
+        row += 1
+        fields = next(csv.reader([record]), [])
+        record = ""
+        if any(field.strip() for field in fields):
+            yield row, fields
+    if record:
+        yield row + 1, None
+
+
+async def iter_csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple]:
+    """(row number, item_name, quantity, error) from CSV with an item_name,quantity header.
+
+    Without a recognisable header the first two columns are taken as item name and
+    quantity. `error` is None unless the record itself is malformed.
+    """
+    columns = None
+    async for row, fields in iter_csv_records(chunks):
+        if fields is None:
+            yield row, None, None, "unterminated quoted field"
+            continue
+        if columns is None:
+            header = [field.strip().lower() for field in fields]
+            if all(name in header for name in CSV_COLUMNS):
+                columns = tuple(header.index(name) for name in CSV_COLUMNS)
+                continue
+            columns = (0, 1)
+        if len(fields) <= max(columns):
+            yield row, None, None, f"expected columns {', '.join(CSV_COLUMNS)}"
+            continue
+        yield row, fields[columns[0]], fields[columns[1]], None
+
+
+def iter_json_rows(body: bytes) -> Iterator[tuple]:
+    """(row number, item_name, quantity, error) from a JSON array of {"item_name", "quantity"} objects.
+
+    Raises InventoryImportError if the body is not a JSON array. The array is parsed whole, so
+    large imports should use CSV.
+    """
+    try:
+        items = json.loads(body)
+    except ValueError as e:
+        raise InventoryImportError(f"Invalid JSON: {e}")
+    if not isinstance(items, list):
+        raise InventoryImportError("Expected a JSON array of {item_name, quantity} objects")
+    for row, item in enumerate(items, start=1):
+        if not isinstance(item, dict):
+            yield row, None, None, "expected an object with item_name and quantity"
+        else:
+            yield row, item.get("item_name"), item.get("quantity"), None
+
+
+class ValidatedRows:
+    """Valid rows spooled to a temporary file (memory up to SPOOL_MAX_BYTES), plus the
+    rejected rows' results. Lets the upload be read and checked before the database
+    transaction starts, so a slow client never holds SQLite's write lock."""
+
+    def __init__(self):
+        self._file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, mode="w+", encoding="utf-8")
+        self.rejected = []  # {"row", "item_name", "status": "error", "error"}
+        self.count = 0
+
+    def add(self, row: int, item_name, quantity, error: Optional[str] = None):
+        if error is None:
+            try:
+                item_name, quantity = validate_row(item_name, quantity)
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            self.rejected.append({"row": row, "item_name": item_name if isinstance(item_name, str) else None,
+                                  "status": "error", "error": error})
+            return
+        self._file.write(json.dumps([row, item_name, quantity], ensure_ascii=False) + "\n")
+        self.count += 1
+
+    @property
+    def total(self) -> int:
+        return self.count + len(self.rejected)
+
+    def batches(self, size: int = BULK_UPSERT_BATCH_SIZE) -> Iterator[list]:
+        """Valid rows in upload order as lists of (row, item_name, quantity)."""
+        self._file.seek(0)
+        batch = []
+        for line in self._file:
+            batch.append(tuple(json.loads(line)))
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def close(self):
+        self._file.close()
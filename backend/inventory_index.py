@@ -0,0 +1,184 @@
+import json
+import time
+import logging
+import threading
+import unicodedata
+from collections import deque
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+ALIASES_PATH = Path(__file__).parent / "inventory_aliases.json"
+# Words that make a query a general stock question ("what medicines are available?"), per language
+KEYWORDS_PATH = Path(__file__).parent / "inventory_keywords.json"
+
+
+def normalize_text(text: str) -> str:
+    return unicodedata.normalize("NFC", text).casefold()
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: finds every occurrence of every pattern in one pass over the text."""
+
+    def __init__(self, patterns: dict):
+        """`patterns` maps pattern string -> payload returned with each match."""
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for pattern, payload in patterns.items():
+            if pattern:
+                self._add(pattern, payload)
+        self._build_failure_links()
+
+    def _add(self, pattern: str, payload):
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(pattern), payload))
+
+    def _build_failure_links(self):
+        bfs = deque(self._goto[0].values())
+        while bfs:
+            node = bfs.popleft()
+            for ch, child in self._goto[node].items():
+                bfs.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                # Inherit matches that end at the fallback state (patterns that are suffixes)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find_all(self, text: str):
+        """Yield (start, end, payload) for every match in `text`."""
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for length, payload in self._out[node]:
+                yield i + 1 - length, i + 1, payload
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum()
+
+def _on_word_boundary(text: str, start: int, end: int) -> bool:
+    """Latin item names must match whole words ("ORS" should not match "doctors")."""
+    if start > 0 and _is_word_char(text[start - 1]) and _is_word_char(text[start]):
+        return False
+    if end < len(text) and _is_word_char(text[end]) and _is_word_char(text[end - 1]):
+        return False
+    return True
+
+
+class InventoryIndex:
+    """In-memory copy of the Inventory table with a one-pass item-name matcher.
+
+    Names and per-language aliases (see inventory_aliases.json) are compiled into an
+    Aho-Corasick automaton, so finding every item mentioned in a query costs one scan
+    of the query regardless of catalogue size, and no database round-trips. General
+    stock keywords (inventory_keywords.json) get the same treatment, so untranslated
+    Hindi and Kannada queries are recognised too.
+    """
+
+    def __init__(self, aliases_path: Path = ALIASES_PATH, keywords_path: Path = KEYWORDS_PATH):
+        self._lock = threading.Lock()
+        self._quantities = {}  # item_name -> quantity
+        self._aliases = self._load_json(aliases_path)  # language -> {alias: item_name}
+        self._matchers = {}  # language -> AhoCorasick
+        keywords = self._load_json(keywords_path)  # language -> [keyword]
+        # English keywords always apply; with no language given, every language's do
+        self._keyword_matchers = {
+            language: AhoCorasick({normalize_text(k): True for k in keywords.get("en", []) + words})
+            for language, words in keywords.items()
+        }
+        self._keyword_matchers[None] = AhoCorasick({normalize_text(k): True for words in keywords.values() for k in words})
+        self.loaded_at = 0.0
+        # Inventory version (see auth.InventoryVersion) the contents reflect
+        self.version = 0
+
+    @staticmethod
+    def _load_json(path: Path) -> dict:
+        if not path.exists():
+            return {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read {path.name}: {e}")
+            return {}
+
+    def _patterns(self, *languages) -> dict:
+        patterns = {normalize_text(name): name for name in self._quantities}
+        for language in languages:
+            for alias, item_name in self._aliases.get(language, {}).items():
+                if item_name in self._quantities:
+                    patterns[normalize_text(alias)] = item_name
+        return patterns
+
+    def _rebuild(self):
+        # Canonical names and English aliases always match (translated queries are English);
+        # each other language adds its own aliases on top
+        matchers = {None: AhoCorasick(self._patterns("en"))}
+        for language in self._aliases:
+            if language != "en":
+                matchers[language] = AhoCorasick(self._patterns("en", language))
+        self._matchers = matchers
+
+    def load(self, items, version: int = 0):
+        """Replace the index contents with `items` ((item_name, quantity) pairs) as of `version`."""
+        with self._lock:
+            self._quantities = {name: quantity for name, quantity in items}
+            self._rebuild()
+            self.loaded_at = time.monotonic()
+            self.version = version
+        logger.info(f"Inventory index loaded with {len(self._quantities)} items (version {version})")
+
+    def upsert(self, item_name: str, quantity: int, version: int = None):
+        """Apply a committed inventory write; only a new name needs the matcher rebuilt."""
+        with self._lock:
+            is_new = item_name not in self._quantities
+            self._quantities[item_name] = quantity
+            if is_new:
+                self._rebuild()
+            # Only a write following the loaded version moves it; otherwise another
+            # worker wrote in between and the next refresh reloads everything
+            if version is not None and version == self.version + 1:
+                self.version = version
+
+    def all_items(self) -> list:
+        with self._lock:
+            return list(self._quantities.items())
+
+    def match(self, text: str, language: str = None) -> list:
+        """Return (item_name, quantity) for each distinct item mentioned in `text`, in order of appearance."""
+        normalized = normalize_text(text)
+        with self._lock:
+            matcher = self._matchers.get(language) or self._matchers.get(None)
+            if matcher is None:
+                return []
+            found = {}
+            for start, end, item_name in matcher.find_all(normalized):
+                if item_name not in found and _on_word_boundary(normalized, start, end):
+                    found[item_name] = self._quantities[item_name]
+            return list(found.items())
+
+    def is_general_query(self, text: str, language: str = None) -> bool:
+        """True if `text` asks about stock in general (any keyword, as a substring)."""
+        matcher = self._keyword_matchers.get(language) or self._keyword_matchers[None]
+        return next(matcher.find_all(normalize_text(text)), None) is not None
+
+    def __len__(self):
+        return len(self._quantities)
+
+
+# Global inventory index
+inventory_index = InventoryIndex()
@@ -0,0 +1,51 @@
+import unicodedata
+
+# Unicode blocks for the scripts our users type in
+SCRIPT_RANGES = {
+    "devanagari": (0x0900, 0x097F),
+    "kannada": (0x0C80, 0x0CFF),
+}
+LATIN = "latin"
+MIXED = "mixed"
+UNKNOWN = "unknown"
+
+# Share of letters that must belong to one script for it to count as the query's script
+DOMINANT_SCRIPT_SHARE = 0.9
+
+
+def char_script(ch: str) -> str:
+    code = ord(ch)
+    for script, (low, high) in SCRIPT_RANGES.items():
+        if low <= code <= high:
+            return script
+    if ch.isascii() or unicodedata.name(ch, "").startswith("LATIN"):
+        return LATIN
+    return UNKNOWN
+
+def detect_script(text: str) -> str:
+    """Return the dominant script of `text` ("latin", "devanagari", "kannada"), "mixed" or "unknown".
+
+    Only letters are counted (combining vowel signs included), so digits,
+    punctuation and emoji do not affect the result.
+    """
+    counts = {}
+    for ch in text:
+        if not (ch.isalpha() or unicodedata.category(ch).startswith("M")):
+            continue
+        script = char_script(ch)
+        counts[script] = counts.get(script, 0) + 1
+    total = sum(counts.values())
+    if not total:
+        return UNKNOWN
+    script, count = max(counts.items(), key=lambda item: item[1])
+    if count / total >= DOMINANT_SCRIPT_SHARE:
+        return script
+    return MIXED
+
+def needs_translation(text: str) -> bool:
+    """False when the query is already in Latin script (typed English, drug names), so Gemini can be skipped."""
+    return detect_script(text) not in (LATIN, UNKNOWN)
+
+def translation_prompt(query: str) -> str:
+    """Prompt asking the LLM for a one-line English translation of a user query."""
+    return f"Translate the following user query to a single sentence of plain English. Return ONLY the translated sentence, with no other commentary: '{query}'"
@@ -0,0 +1,245 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# --- LLM gateway tuning (override via environment) ---
+#   gemini - Google Gemini through google.generativeai (the original path)
+#   fake   - local deterministic backend for tests, benchmarks and offline development
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME", "models/gemini-2.5-flash")
+# Upstream calls in flight at once; further callers wait for a slot instead of piling onto quota
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+# Deadline for one call, including retries and time spent waiting for a slot
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 30))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", 0.5))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", 8))
+# Simulated generation time of the fake backend
+LLM_FAKE_LATENCY_MS = float(os.getenv("LLM_FAKE_LATENCY_MS", 0))
+
+LLM_BACKENDS = ("gemini", "fake")
+
+# Transient upstream failures (google.api_core exception names, so google is not imported here)
+RETRYABLE_ERRORS = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout", "ConnectionError", "TimeoutError",
+}
+
+
+class LLMError(Exception):
+    pass
+
+class LLMUnavailableError(LLMError):
+    """No backend is configured (e.g. GOOGLE_API_KEY is not set)."""
+
+class LLMTimeoutError(LLMError):
+    """The call did not finish within its deadline."""
+
+
+# --- Backends: blocking calls, run on the gateway's own threads ---
+class GeminiBackend:
+    def __init__(self, api_key: str, model_name: str = LLM_MODEL_NAME):
+        if not api_key:
+            raise LLMUnavailableError("GOOGLE_API_KEY environment variable not set")
+        # Imported here: google.generativeai takes seconds to import
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        # One model object for the whole process
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        return self.model.generate_content(prompt, request_options={"timeout": timeout}).text
+
+    def stream(self, prompt: str, timeout: float) -> Iterator[str]:
+        for chunk in self.model.generate_content(prompt, stream=True, request_options={"timeout": timeout}):
+            # Chunks without text (e.g. safety metadata only) raise on .text
+            if chunk.parts:
+                yield chunk.text
+
+
+class FakeLLMBackend:
+    """Deterministic stand-in for tests: answers with `responder(prompt)` after `latency` seconds.
+
+    The default responder echoes the prompt's last line, so answers differ per prompt.
+    """
+
+    def __init__(self, responder: Optional[Callable[[str], str]] = None, latency: float = LLM_FAKE_LATENCY_MS / 1000):
+        self.responder = responder or (lambda prompt: f"[fake answer] {prompt.strip().splitlines()[-1][:200]}")
+        self.latency = latency
+        self.calls = 0
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        self.calls += 1
+        if self.latency:
+            time.sleep(min(self.latency, timeout))
+        return self.responder(prompt)
+
+    def stream(self, prompt: str, timeout: float) -> Iterator[str]:
+        words = self.generate(prompt, timeout).split(" ")
+        for i, word in enumerate(words):
+            yield word if i == 0 else " " + word
+
+
+def create_backend(backend: str = None):
+    backend = backend or LLM_BACKEND
+    if backend not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND '{backend}', expected one of {LLM_BACKENDS}")
+    if backend == "fake":
+        return FakeLLMBackend()
+    return GeminiBackend(os.getenv("GOOGLE_API_KEY"))
+
+
+class LLMGateway:
+    """The one way the app talks to the LLM.
+
+    - The backend (and its model object) is created once and reused.
+    - At most `max_concurrency` upstream calls run at a time, on the gateway's own
+      threads, so a spike neither drains the default executor nor bursts through quota.
+    - Identical prompts in flight at the same time share one upstream call (singleflight).
+    - Each call has a deadline covering queueing, the call itself and retries; transient
+      upstream errors are retried with exponential backoff and full jitter.
+    """
+
+    def __init__(self, backend=None, max_concurrency: int = LLM_MAX_CONCURRENCY, timeout: float = LLM_TIMEOUT_SECONDS,
+                 max_retries: int = LLM_MAX_RETRIES):
+        self._backend = backend
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        self._semaphore = None
+        self._semaphore_loop = None
+        self._inflight = {}  # prompt -> asyncio.Task of the shared upstream call
+        self.stats = {"calls": 0, "upstream_calls": 0, "singleflight_hits": 0, "retries": 0, "timeouts": 0, "failures": 0}
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = create_backend()
+        return self._backend
+
+    def set_backend(self, backend):
+        """Swap the backend (tests, benchmarks)."""
+        self._backend = backend
+
+    def warm_up(self):
+        """Create the backend now instead of on the first request. Blocking."""
+        return self.backend
+
+    def _slots(self) -> asyncio.Semaphore:
+        # A semaphore belongs to one event loop; test clients may start a new loop per test
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt))
+
+    @staticmethod
+    def _retryable(error: Exception) -> bool:
+        return type(error).__name__ in RETRYABLE_ERRORS
+
+    async def generate(self, prompt: str, timeout: float = None) -> str:
+        """Full completion for `prompt`. Raises LLMTimeoutError past the deadline."""
+        self.stats["calls"] += 1
+        task = self._inflight.get(prompt)
+        if task is None:
+            task = asyncio.ensure_future(self._generate(prompt, timeout or self.timeout))
+            self._inflight[prompt] = task
+            task.add_done_callback(lambda _: self._inflight.pop(prompt, None))
+        else:
+            self.stats["singleflight_hits"] += 1
+        # Shielded: one caller going away (client disconnect) must not cancel the others' call
+        return await asyncio.shield(task)
+
+    async def _generate(self, prompt: str, timeout: float) -> str:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        attempt = 0
+
+        async def call_upstream():
+            async with self._slots():
+                self.stats["upstream_calls"] += 1
+                # The backend gets what is left after queueing, so the HTTP call gives up too
+                remaining = max(deadline - loop.time(), 0.001)
+                return await loop.run_in_executor(self._executor, self.backend.generate, prompt, remaining)
+
+        while True:
+            try:
+                return await asyncio.wait_for(call_upstream(), max(deadline - loop.time(), 0))
+            except Exception as e:
+                # asyncio.TimeoutError is the builtin TimeoutError: only our own deadline
+                # firing is final; a backend timing out early is retried like other errors
+                if isinstance(e, asyncio.TimeoutError) and loop.time() >= deadline:
+                    self.stats["timeouts"] += 1
+                    raise LLMTimeoutError(f"LLM call exceeded its {timeout:g}s deadline") from e
+                error = e
+            delay = self._backoff(attempt)
+            if attempt >= self.max_retries or not self._retryable(error) or loop.time() + delay >= deadline:
+                self.stats["failures"] += 1
+                raise error
+            attempt += 1
+            self.stats["retries"] += 1
+            logger.warning(f"LLM call failed ({type(error).__name__}: {error}), retry {attempt} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    async def stream(self, prompt: str, timeout: float = None) -> AsyncIterator[str]:
+        """Yield the completion as it is generated. Holds one concurrency slot throughout.
+
+        Failures before the first chunk are retried like `generate`; once text has been
+        sent a failure is raised to the caller. Streams are not shared between callers.
+        """
+        self.stats["calls"] += 1
+        loop = asyncio.get_running_loop()
+        timeout = timeout or self.timeout
+        deadline = loop.time() + timeout
+        done = object()
+        attempt = 0
+        async with self._slots():
+            while True:
+                sent_any = False
+                try:
+                    self.stats["upstream_calls"] += 1
+                    iterator = self.backend.stream(prompt, max(deadline - loop.time(), 0.001))
+                    while True:
+                        remaining = deadline - loop.time()
+                        if remaining <= 0:
+                            raise asyncio.TimeoutError()
+                        chunk = await asyncio.wait_for(
+                            loop.run_in_executor(self._executor, next, iterator, done), remaining
+                        )
+                        if chunk is done:
+                            return
+                        sent_any = True
+                        yield chunk
+                except Exception as e:
+                    if isinstance(e, asyncio.TimeoutError) and loop.time() >= deadline:
+                        self.stats["timeouts"] += 1
+                        raise LLMTimeoutError(f"LLM stream exceeded its {timeout:g}s deadline") from e
+                    delay = self._backoff(attempt)
+                    if sent_any or attempt >= self.max_retries or not self._retryable(e) or loop.time() + delay >= deadline:
+                        self.stats["failures"] += 1
+                        raise
+                    attempt += 1
+                    self.stats["retries"] += 1
+                    logger.warning(f"LLM stream failed ({type(e).__name__}: {e}), retry {attempt} in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Global gateway
+llm_gateway = LLMGateway()
@@ -0,0 +1,341 @@
+import os
+import sys
+import time
+import random
+import logging
+import threading
+import contextvars
+from pathlib import Path
+from collections import Counter as StackCounter
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# --- Instrumentation (override via environment) ---
+# Per-stage timings in a Server-Timing response header (visible in browser dev tools)
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "1") == "1"
+# Sampling profiler for slow requests, off by default. When on, PROFILE_SAMPLE_RATE of
+# requests are sampled every PROFILE_INTERVAL_MS; those slower than SLOW_REQUEST_PROFILE_MS
+# are written to PROFILE_DIR as folded stacks (flamegraph.pl / speedscope input).
+SLOW_REQUEST_PROFILE_MS = float(os.getenv("SLOW_REQUEST_PROFILE_MS", 0))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0.1))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", Path(__file__).parent / "profiles"))
+
+# Seconds; LLM generation sits in the top buckets, the BM25 fast path in the bottom ones
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for key, value in labels.items())
+    return "{" + ",".join(escaped) + "}"
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, *labelvalues):
+        with self._lock:
+            series = self._series.setdefault(labelvalues, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labelvalues, values in sorted(series.items()):
+            labels = dict(zip(self.labelnames, labelvalues))
+            for bound, count in zip(self.buckets, values):
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {values[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(values[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {values[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *labelvalues, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for labelvalues, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, labelvalues)))} {_format_value(value)}")
+        return lines
+
+
+class CallbackMetric:
+    """A gauge or counter read from elsewhere at scrape time (cache stats, gateway stats).
+
+    `collect()` returns [(labels dict, value)]; a failing callback drops the metric from
+    that scrape instead of failing it.
+    """
+
+    def __init__(self, name: str, help_text: str, kind: str, collect: Callable[[], list]):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.collect = collect
+
+    def render(self) -> list:
+        try:
+            samples = self.collect()
+        except Exception as e:
+            logger.warning(f"Metric {self.name} not collected: {e}")
+            return []
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{self.name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def counter(self, name: str, help_text: str, labelnames: tuple = ()) -> Counter:
+        return self.register(Counter(name, help_text, labelnames))
+
+    def gauge_callback(self, name: str, help_text: str, collect: Callable[[], list]) -> CallbackMetric:
+        return self.register(CallbackMetric(name, help_text, "gauge", collect))
+
+    def counter_callback(self, name: str, help_text: str, collect: Callable[[], list]) -> CallbackMetric:
+        return self.register(CallbackMetric(name, help_text, "counter", collect))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        return "\n".join(line for metric in self._metrics for line in metric.render()) + "\n"
+
+
+def memory_usage(pid="self") -> dict:
+    """Resident memory of a process in bytes: rss, plus pss (shared pages split between the
+    processes using them) and uss (pages only this process uses) on Linux.
+
+    uss is what a worker really costs: memory shared copy-on-write or through the same
+    mapped files counts in every worker's rss but only once in the machine's total.
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if value.strip().endswith("kB"):
+                    fields[name] = int(value.split()[0]) * 1024
+        return {
+            "rss": fields.get("Rss", 0),
+            "pss": fields.get("Pss", 0),
+            "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        }
+    except OSError:
+        if pid != "self":
+            return {}
+        import resource
+        # Peak rather than current resident size; KiB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {"rss": peak if sys.platform == "darwin" else peak * 1024}
+
+
+# --- Per-request stage timing ---
+class RequestTimings:
+    """Stage durations of one request, in the order they finished."""
+
+    def __init__(self):
+        self.stages = []  # (name, milliseconds)
+
+    def server_timing(self, total_ms: float) -> str:
+        entries = [f"{name};dur={ms:.1f}" for name, ms in self.stages]
+        entries.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(entries)
+
+# Set by MetricsMiddleware for the duration of each request
+_current_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+class SlowRequestProfiler:
+    """Opt-in sampling profiler: stacks of every thread, every `interval` seconds.
+
+    Samples are taken only while a sampled request is in flight. The samples cover the
+    whole process during that request (the event loop interleaves requests, and retrieval
+    and LLM calls run on pool threads), so a dump shows where the process spent the
+    request's time rather than that request's code path alone.
+    """
+
+    def __init__(self, threshold_ms: float = SLOW_REQUEST_PROFILE_MS, sample_rate: float = PROFILE_SAMPLE_RATE,
+                 interval_ms: float = PROFILE_INTERVAL_MS, directory: Path = PROFILE_DIR):
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._active = {}  # id -> stack counts of each sampled request in flight
+        self._thread = None
+        self.dumps = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def start(self) -> Optional[StackCounter]:
+        """Begin sampling for one request; None if this request is not sampled."""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        session = StackCounter()
+        with self._lock:
+            self._active[id(session)] = session
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+                self._thread.start()
+        return session
+
+    def stop(self, session: StackCounter, label: str, duration_ms: float, timings: RequestTimings = None):
+        with self._lock:
+            self._active.pop(id(session), None)
+        if duration_ms < self.threshold_ms or not session:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        safe_label = "".join(c if c.isalnum() else "_" for c in label).strip("_")
+        path = self.directory / f"{time.strftime('%Y%m%d-%H%M%S')}_{safe_label}_{duration_ms:.0f}ms.folded"
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in session.most_common():
+                f.write(f"{stack} {count}\n")
+        self.dumps += 1
+        breakdown = timings.server_timing(duration_ms) if timings else ""
+        logger.warning(f"Slow request {label} took {duration_ms:.0f} ms ({breakdown}); profile written to {path}")
+
+    def _sample(self):
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                sessions = list(self._active.values())
+                if not sessions:
+                    self._thread = None
+                    return
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                calls = []
+                while frame is not None:
+                    calls.append(f"{frame.f_code.co_name} ({Path(frame.f_code.co_filename).name}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stacks.append(";".join([names.get(ident, str(ident))] + calls[::-1]))
+            for session in sessions:
+                session.update(stacks)
+            time.sleep(self.interval)
+
+
+# --- Global registry and the metrics the app always records ---
+metrics = MetricsRegistry()
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency, to the end of the response body",
+    ("method", "route", "status")
+)
+http_requests_total = metrics.counter("http_requests_total", "HTTP requests served", ("method", "route", "status"))
+stage_duration = metrics.histogram("request_stage_duration_seconds", "Time spent in each stage of a request", ("stage",))
+_in_flight = {"count": 0}
+metrics.gauge_callback("http_requests_in_flight", "HTTP requests being served", lambda: [({}, _in_flight["count"])])
+metrics.gauge_callback(
+    "process_memory_bytes", "Resident memory of this worker (rss, pss, uss; see memory_usage)",
+    lambda: [({"kind": kind, "pid": os.getpid()}, value) for kind, value in memory_usage().items()]
+)
+profiler = SlowRequestProfiler()
+
+
+def record_stage(name: str, seconds: float):
+    """Record a stage duration in the stage histogram and, inside a request, in its Server-Timing header."""
+    stage_duration.observe(seconds, name)
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.stages.append((name, seconds * 1000))
+
+@contextmanager
+def stage(name: str):
+    """Time a block as one request stage. Works around `await` in async code."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+class MetricsMiddleware:
+    """ASGI middleware: request latency/count metrics, the Server-Timing header and the
+    slow-request profiler hook.
+
+    Routes are labelled by their template ("/api/chat"), never the raw path, so metric
+    cardinality stays bounded. The header lists the stages finished before the response
+    started; for streaming responses generation stages land in the histograms only.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        session = profiler.start()
+        start = time.perf_counter()
+        status_code = [500]
+        _in_flight["count"] += 1
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status_code[0] = message["status"]
+                if SERVER_TIMING_HEADER:
+                    total_ms = (time.perf_counter() - start) * 1000
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", timings.server_timing(total_ms).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _in_flight["count"] -= 1
+            _current_timings.reset(token)
+            elapsed = time.perf_counter() - start
+            route = getattr(scope.get("route"), "path", "unmatched")
+            labels = (scope["method"], route, str(status_code[0]))
+            http_request_duration.observe(elapsed, *labels)
+            http_requests_total.inc(*labels)
+            if session is not None:
+                profiler.stop(session, f"{scope['method']} {route}", elapsed * 1000, timings)
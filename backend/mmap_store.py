@@ -0,0 +1,164 @@
+import os
+import json
+import logging
+from pathlib import Path
+import numpy as np
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+# On-disk precision. float16 halves the file and page cache footprint, but NumPy upcasts
+# it to float32 for every search (~1 ms per 1k chunks on a small VM, most of the search
+# time); float32 skips that and searches a few thousand chunks in well under a millisecond.
+MMAP_VECTOR_DTYPE = os.getenv("MMAP_VECTOR_DTYPE", "float16")
+# Rows converted to float32 per matmul block; bounds the scratch memory of a search
+SEARCH_BLOCK_ROWS = int(os.getenv("MMAP_SEARCH_BLOCK_ROWS", 16384))
+
+
+class MmapVectorStore:
+    """Read-mostly vector store backed by memory-mapped files, an alternative to Chroma.
+
+    On disk, for a store called `name`:
+        {name}.vectors.npy  float16 (or MMAP_VECTOR_DTYPE) [n, dim] unit-normalized embeddings
+        {name}.text.bin     UTF-8 chunk texts, concatenated
+        {name}.offsets.npy  int64 [n + 1] byte offsets into text.bin
+        {name}.meta.json    chunk IDs and metadata (written last; it is the commit point)
+
+    Opening the store maps the arrays instead of reading them, so load time does not
+    grow with the corpus, and worker processes forked after load share the same pages
+    through the OS page cache. Search is a brute-force cosine top-k with NumPy.
+
+    Writes (`upsert_embeddings`, `delete`) are staged in memory and written by `flush()`;
+    they only happen while the knowledge base is being (re)indexed at startup. `get()`
+    sees staged writes immediately, like Chroma's.
+    """
+
+    def __init__(self, directory: Path, name: str, embedding_function, dtype: str = MMAP_VECTOR_DTYPE):
+        self.directory = Path(directory)
+        self.dtype = np.dtype(dtype)
+        self.name = name
+        self.embedding_function = embedding_function
+        self.ids = []
+        self.metadatas = []
+        self.vectors = None
+        self._text = None
+        self._offsets = None
+        self._row_by_id = {}
+        self._staged = None  # {chunk_id: (vector, text, metadata)} while there are unflushed writes
+        self._load()
+
+    def _path(self, suffix: str) -> Path:
+        return self.directory / f"{self.name}.{suffix}"
+
+    def _load(self):
+        meta_path = self._path("meta.json")
+        if not meta_path.exists():
+            return
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            vectors = np.load(self._path("vectors.npy"), mmap_mode="r")
+            offsets = np.load(self._path("offsets.npy"), mmap_mode="r")
+            text = np.memmap(self._path("text.bin"), dtype=np.uint8, mode="r") if offsets[-1] else np.zeros(0, np.uint8)
+            if len(vectors) != len(meta["ids"]) or len(offsets) != len(meta["ids"]) + 1:
+                raise ValueError("vector, offset and metadata counts disagree")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not open memory-mapped vector store '{self.name}', starting empty: {e}")
+            return
+        self.ids, self.metadatas = meta["ids"], meta["metadatas"]
+        self.vectors, self._offsets, self._text = vectors, offsets, text
+        self._row_by_id = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        logger.info(f"Memory-mapped {len(self.ids)} vectors from {self._path('vectors.npy')}")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _row_text(self, row: int) -> str:
+        return bytes(self._text[self._offsets[row]:self._offsets[row + 1]]).decode("utf-8")
+
+    # --- Writes ---
+    def _stage(self) -> dict:
+        if self._staged is None:
+            self._staged = {
+                chunk_id: (self.vectors[row], self._row_text(row), self.metadatas[row])
+                for row, chunk_id in enumerate(self.ids)
+            }
+        return self._staged
+
+    def upsert_embeddings(self, ids: list, embeddings: list, documents: list, metadatas: list):
+        staged = self._stage()
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        for chunk_id, vector, text, metadata in zip(ids, vectors.astype(self.dtype), documents, metadatas):
+            staged[chunk_id] = (vector, text, metadata)
+
+    def delete(self, ids: list):
+        staged = self._stage()
+        for chunk_id in ids:
+            staged.pop(chunk_id, None)
+
+    def flush(self):
+        """Write staged changes to disk and re-map the files."""
+        if self._staged is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        ids = list(self._staged)
+        rows = list(self._staged.values())
+        dim = len(rows[0][0]) if rows else (self.vectors.shape[1] if self.vectors is not None else 0)
+        vectors = np.stack([row[0] for row in rows]).astype(self.dtype, copy=False) if rows else np.zeros((0, dim), self.dtype)
+        encoded = [row[1].encode("utf-8") for row in rows]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+
+        # Drop our own mappings before replacing the files underneath them
+        self.vectors = self._offsets = self._text = None
+        for suffix, write in (
+            ("vectors.npy", lambda f: np.save(f, vectors)),
+            ("offsets.npy", lambda f: np.save(f, offsets)),
+            ("text.bin", lambda f: f.write(b"".join(encoded))),
+            ("meta.json", lambda f: f.write(json.dumps({"ids": ids, "metadatas": [row[2] for row in rows]}).encode("utf-8"))),
+        ):
+            tmp_path = self._path(suffix + ".tmp")
+            with open(tmp_path, "wb") as f:
+                write(f)
+            os.replace(tmp_path, self._path(suffix))
+        self._staged = None
+        self._load()
+
+    # --- Reads (the subset of the LangChain Chroma API that RAGSystem uses) ---
+    def get(self, ids: list = None, include: list = ("documents", "metadatas")) -> dict:
+        """Stored chunks by ID (all of them when `ids` is None), unflushed writes included."""
+        if self._staged is not None:
+            # Reads must see staged deletes and upserts, as Chroma's do right after a write
+            found = list(self._staged) if ids is None else [c for c in ids if c in self._staged]
+            result = {"ids": found}
+            if "documents" in include:
+                result["documents"] = [self._staged[c][1] for c in found]
+            if "metadatas" in include:
+                result["metadatas"] = [self._staged[c][2] for c in found]
+            return result
+        rows = range(len(self.ids)) if ids is None else [self._row_by_id[c] for c in ids if c in self._row_by_id]
+        result = {"ids": [self.ids[row] for row in rows]}
+        if "documents" in include:
+            result["documents"] = [self._row_text(row) for row in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [self.metadatas[row] for row in rows]
+        return result
+
+    def similarity_search_by_vector(self, embedding: list, k: int = 4) -> list:
+        if self.vectors is None or not len(self.ids) or k <= 0:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        # NumPy has no fast float16 matmul, so upcast in blocks rather than all at once
+        scores = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), SEARCH_BLOCK_ROWS):
+            block = self.vectors[start:start + SEARCH_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32, copy=False) @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [Document(page_content=self._row_text(row), metadata=self.metadatas[row]) for row in top]
+
+    def similarity_search(self, query: str, k: int = 4) -> list:
+        return self.similarity_search_by_vector(self.embedding_function.embed_query(query), k=k)
@@ -0,0 +1,229 @@
+"""Retrieval sidecar: one process holds the embedding model and the index for every API worker.
+
+Usage (from backend/):
+    python rag_service.py                              # build/load the index, then serve
+    RAG_MODE=service uvicorn auth:app --workers 4      # workers query the sidecar
+
+Each uvicorn worker otherwise loads its own copy of the model and opens its own vector
+store (uvicorn starts workers with spawn, so nothing is shared copy-on-write). With
+RAG_MODE=service the workers never import torch or the vector store; they send queries
+over a Unix socket, and the sidecar's micro-batching embedder batches concurrent queries
+from all workers into one forward pass. Compare resident memory with report_memory.py.
+
+Protocol: a 4-byte big-endian length followed by a UTF-8 JSON object, in both directions,
+over a persistent connection per client thread.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import struct
+import logging
+import threading
+import socketserver
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# --- Retrieval sidecar (override via environment) ---
+RAG_SERVICE_SOCKET = os.getenv("RAG_SERVICE_SOCKET", "/tmp/aacharya-rag.sock")
+# How long a worker waits for the sidecar to come up (it builds the index before listening)
+RAG_SERVICE_CONNECT_TIMEOUT = float(os.getenv("RAG_SERVICE_CONNECT_TIMEOUT", 600))
+RAG_SERVICE_REQUEST_TIMEOUT = float(os.getenv("RAG_SERVICE_REQUEST_TIMEOUT", 30))
+# A /metrics scrape waits at most this long for the sidecar's stats, then reports the last ones
+RAG_SERVICE_STATS_TIMEOUT = float(os.getenv("RAG_SERVICE_STATS_TIMEOUT", 2))
+
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+_HEADER = struct.Struct(">I")
+
+
+class RAGServiceError(Exception):
+    pass
+
+
+def _recv_exactly(stream, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = stream.recv(size - len(data)) if isinstance(stream, socket.socket) else stream.read(size - len(data))
+        if not chunk:
+            return bytes(data)
+        data.extend(chunk)
+    return bytes(data)
+
+def read_message(stream):
+    """Next message from a socket or file, or None when the peer closed the connection."""
+    header = _recv_exactly(stream, _HEADER.size)
+    if len(header) < _HEADER.size:
+        return None
+    (length,) = _HEADER.unpack(header)
+    if length > MAX_MESSAGE_BYTES:
+        raise RAGServiceError(f"Message of {length} bytes exceeds the {MAX_MESSAGE_BYTES} byte limit")
+    payload = _recv_exactly(stream, length)
+    if len(payload) < length:
+        return None
+    return json.loads(payload)
+
+def encode_message(message: dict) -> bytes:
+    payload = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    return _HEADER.pack(len(payload)) + payload
+
+
+# --- Server side ---
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                request = read_message(self.rfile)
+            except (RAGServiceError, ValueError) as e:
+                self.wfile.write(encode_message({"error": str(e)}))
+                return
+            if request is None:
+                return
+            try:
+                response = self.server.dispatch(request)
+            except Exception as e:
+                logger.error(f"RAG service request failed: {e}")
+                response = {"error": str(e)}
+            self.wfile.write(encode_message(response))
+
+
+class RAGServiceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves `retrieve` and `stats` for a ready RAGSystem; one thread per client connection."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, rag_system):
+        self.rag_system = rag_system
+        self.started_at = time.time()
+        path = Path(socket_path)
+        if path.exists():
+            path.unlink()  # left behind by a previous run
+        super().__init__(socket_path, _RequestHandler)
+        # Workers run as the same user; keep other users off the socket
+        os.chmod(socket_path, 0o600)
+
+    def dispatch(self, request: dict) -> dict:
+        op = request.get("op")
+        if op == "retrieve":
+            docs = self.rag_system.retrieve(request["query"], k=int(request.get("k", 3)))
+            return {"documents": [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in docs]}
+        if op == "stats":
+            from metrics import memory_usage
+            embedder = self.rag_system.query_embeddings
+            return {
+                "pid": os.getpid(),
+                "uptime_seconds": time.time() - self.started_at,
+                "retrieval_stats": dict(self.rag_system.retrieval_stats),
+                "embedder": embedder.stats() if embedder is not None else None,
+                "memory": memory_usage(),
+            }
+        if op == "ping":
+            return {"ok": True}
+        raise RAGServiceError(f"Unknown op '{op}'")
+
+
+def serve(socket_path: str = RAG_SERVICE_SOCKET):
+    from rag_setup import rag_system
+    rag_system.setup()
+    server = RAGServiceServer(socket_path, rag_system)
+    logger.info(f"RAG service listening on {socket_path} (pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        Path(socket_path).unlink(missing_ok=True)
+
+
+# --- Client side (API workers) ---
+class RemoteRAGSystem:
+    """Stands in for rag_setup.RAGSystem in a worker, forwarding retrieval to the sidecar.
+
+    Each calling thread keeps its own connection, so RAG_EXECUTOR threads query in
+    parallel and the sidecar batches them with everyone else's.
+    """
+
+    def __init__(self, socket_path: str = RAG_SERVICE_SOCKET, timeout: float = RAG_SERVICE_REQUEST_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+        # Last stats fetched by refresh_stats(); metric callbacks read this, never the socket
+        self.last_stats = {}
+        self.query_embeddings = _RemoteEmbedderStats(self)
+
+    def _connection(self) -> socket.socket:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.settimeout(self.timeout)
+            conn.connect(self.socket_path)
+            self._local.conn = conn
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            conn.close()
+
+    def call(self, request: dict) -> dict:
+        # One retry on a fresh connection: the sidecar may have restarted since the last call
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.sendall(encode_message(request))
+                response = read_message(conn)
+                if response is None:
+                    raise ConnectionError("RAG service closed the connection")
+                break
+            except OSError:
+                self._drop_connection()
+                if attempt:
+                    raise
+        if "error" in response:
+            raise RAGServiceError(response["error"])
+        return response
+
+    def wait_until_ready(self, timeout: float = RAG_SERVICE_CONNECT_TIMEOUT):
+        """Block until the sidecar answers (it listens only once its index is built)."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self.call({"op": "ping"})
+            except OSError as e:
+                if time.monotonic() > deadline:
+                    raise RAGServiceError(f"RAG service at {self.socket_path} not reachable: {e}")
+                time.sleep(1)
+
+    def retrieve(self, query_text: str, k: int = 3) -> list:
+        from langchain_core.documents import Document
+        response = self.call({"op": "retrieve", "query": query_text, "k": k})
+        return [Document(page_content=doc["page_content"], metadata=doc["metadata"]) for doc in response["documents"]]
+
+    def stats(self) -> dict:
+        return self.call({"op": "stats"})
+
+    def refresh_stats(self) -> dict:
+        """Fetch the sidecar's stats into `last_stats` (blocking; run off the event loop)."""
+        self.last_stats = self.stats()
+        return self.last_stats
+
+    @property
+    def retrieval_stats(self) -> dict:
+        return self.last_stats.get("retrieval_stats", {})
+
+
+class _RemoteEmbedderStats:
+    """`query_embeddings.stats()` for the metrics endpoint: the sidecar's batcher stats as of
+    the last refresh_stats(), or None before the first one."""
+
+    def __init__(self, client: RemoteRAGSystem):
+        self.client = client
+
+    def stats(self):
+        return self.client.last_stats.get("embedder")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    sys.exit(serve(sys.argv[1] if len(sys.argv) > 1 else RAG_SERVICE_SOCKET))
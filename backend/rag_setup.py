@@ -1,10 +1,16 @@
 import os
+import json
+import hashlib
 from pathlib import Path
-from langchain_community.document_loaders import DirectoryLoader, TextLoader, PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
 import logging
+from ingest import IngestionPipeline, STORE_BATCH_SIZE
+from bm25 import BM25Index, reciprocal_rank_fusion
+from mmap_store import MmapVectorStore
+from dedup import INGEST_DEDUP, ChunkDeduplicator
+from embeddings import EMBEDDING_BACKEND, embedding_backend_id, get_embeddings
+from embedding_batcher import MicroBatchEmbedder
 
 logger = logging.getLogger(__name__)
 
@@ -14,118 +20,342 @@ ROOT_DIR = Path(__file__).parent.parent
 KNOWLEDGE_BASE_DIR = ROOT_DIR / "knowledge_base" # This now correctly points to Aacharya AI/knowledge_base
 
 # CHROMA_DB_DIR should stay relative to this file (inside the backend folder)
-CHROMA_DB_DIR = Path(__file__).parent / "chroma_db"
+CHROMA_DB_DIR = Path(os.getenv("CHROMA_DB_DIR", Path(__file__).parent / "chroma_db"))
 # --- MODIFIED SECTION END ---
 
+# Vector store (override via environment):
+#   chroma - persistent Chroma collection (the original path)
+#   mmap   - float16 matrix memory-mapped from disk, searched with NumPy (see mmap_store.py)
+VECTOR_STORE = os.getenv("VECTOR_STORE", "chroma")
+
+# Each embedding backend has its own vector space and each store its own files, so every
+# combination gets its own collection and manifest (torch + chroma keeps the original
+# names so existing databases stay valid)
+INDEX_SUFFIX = ("" if EMBEDDING_BACKEND == "torch" else f"_{EMBEDDING_BACKEND}") + ("_mmap" if VECTOR_STORE == "mmap" else "")
+COLLECTION_NAME = "langchain" if EMBEDDING_BACKEND == "torch" else f"knowledge_base_{EMBEDDING_BACKEND}"
+MANIFEST_PATH = CHROMA_DB_DIR / f"kb_manifest{INDEX_SUFFIX}.json"
+BM25_INDEX_PATH = CHROMA_DB_DIR / f"bm25_index{INDEX_SUFFIX}.json"
+MANIFEST_VERSION = 1
+SUPPORTED_EXTENSIONS = (".txt", ".pdf")
+
+# --- Retrieval tuning (override via environment) ---
+#   hybrid - BM25 fast path for keyword queries, otherwise BM25 and vector results fused by rank
+#   vector - vector similarity only (the original behaviour)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+# Candidates taken from each ranking before fusion
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 20))
+# The fast path only answers short queries made entirely of rare terms: an IDF of 2.0
+# means a term occurs in roughly one chunk in eight or fewer (disease names, drug names).
+BM25_FASTPATH_MAX_TERMS = int(os.getenv("BM25_FASTPATH_MAX_TERMS", 3))
+BM25_FASTPATH_MIN_IDF = float(os.getenv("BM25_FASTPATH_MIN_IDF", 2.0))
+
+
+# --- Knowledge base manifest helpers ---
+def scan_knowledge_base() -> list:
+    """Return the sorted paths (relative to KNOWLEDGE_BASE_DIR) of all indexable files."""
+    if not KNOWLEDGE_BASE_DIR.exists():
+        return []
+    return sorted(
+        path.relative_to(KNOWLEDGE_BASE_DIR).as_posix()
+        for path in KNOWLEDGE_BASE_DIR.rglob("*")
+        if path.is_file() and path.suffix.lower() in SUPPORTED_EXTENSIONS
+    )
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_manifest() -> dict:
+    if MANIFEST_PATH.exists():
+        try:
+            with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            # Manifests written before embedding backends existed were all built with torch
+            manifest.setdefault("embedding", embedding_backend_id("torch"))
+            if manifest.get("version") == MANIFEST_VERSION and manifest.get("embedding") == embedding_backend_id():
+                manifest.setdefault("partial", {})
+                return manifest
+            logger.warning("Manifest version or embedding backend mismatch, rebuilding index")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read manifest, rebuilding index: {e}")
+    # "partial": checkpoints of files an interrupted build had only partly stored
+    return {"version": MANIFEST_VERSION, "embedding": embedding_backend_id(), "files": {}, "partial": {}}
+
+def save_manifest(manifest: dict):
+    # Write to a temp file and rename so a crash never leaves a half-written manifest
+    tmp_path = MANIFEST_PATH.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def open_vectorstore(embedding_function):
+    if VECTOR_STORE == "mmap":
+        return MmapVectorStore(CHROMA_DB_DIR, f"knowledge_base{INDEX_SUFFIX}", embedding_function)
+    return Chroma(
+        persist_directory=str(CHROMA_DB_DIR),
+        collection_name=COLLECTION_NAME,
+        embedding_function=embedding_function
+    )
+
 
 class RAGSystem:
     def __init__(self):
         self.vectorstore = None
         self.embeddings = None
+        # Query-time embedder: batches concurrent queries into one forward pass
+        self.query_embeddings = None
+        self.lexical_index = None
+        # How each retrieval was answered: BM25 fast path, fused, or vector only
+        self.retrieval_stats = {"lexical": 0, "hybrid": 0, "vector": 0}
+        # Stored chunk ID -> other files containing the same (or nearly the same) text
+        self.duplicate_sources = {}
         
     def setup(self):
-        """Initialize the RAG system with knowledge base documents"""
+        """Initialize the RAG system with knowledge base documents."""
+        logger.info("Setting up RAG system...")
+        self.load_embeddings()
+        self.build_index()
+    
+    def load_embeddings(self):
+        """Load the multilingual embeddings model (backend chosen by EMBEDDING_BACKEND)."""
         try:
-            logger.info("Setting up RAG system...")
-            
-            # Initialize multilingual embeddings
             logger.info("Loading multilingual embeddings model...")
-            self.embeddings = HuggingFaceEmbeddings(
-                model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
-                model_kwargs={'device': 'cpu'}
+            self.embeddings = get_embeddings()
+            # Warm up so the first user query does not pay lazy model initialisation
+            self.embeddings.embed_query("warm up")
+            self.query_embeddings = MicroBatchEmbedder(self.embeddings)
+        except Exception as e:
+            logger.error(f"Error loading embeddings model: {str(e)}")
+            raise
+    
+    def build_index(self):
+        """Open the vector store and bring it up to date with the knowledge base.
+
+        Indexing is incremental: a manifest of per-file content hashes and
+        chunk IDs is kept next to the Chroma DB, so only added or changed
+        files are re-split and re-embedded, and chunks of deleted files are
+        removed from the collection.
+        """
+        try:
+            # Open (or create) the persistent vector store
+            CHROMA_DB_DIR.mkdir(parents=True, exist_ok=True)
+            self.vectorstore = open_vectorstore(self.query_embeddings)
+            
+            manifest = load_manifest()
+            if isinstance(self.vectorstore, MmapVectorStore) and manifest["files"]:
+                # The mmap store is written at checkpoints and at the end of a build, so an
+                # interrupted build can leave the manifest ahead of it; re-index from scratch then
+                indexed_ids = self._manifest_chunk_ids(manifest)
+                if len(self.vectorstore.get(ids=indexed_ids, include=[])["ids"]) != len(indexed_ids):
+                    logger.warning("Vector store is missing chunks listed in the manifest, rebuilding index")
+                    manifest["files"], manifest["partial"] = {}, {}
+            self.lexical_index = BM25Index.load(BM25_INDEX_PATH)
+            # Stored chunks the manifest does not list: those an interrupted build wrote after
+            # its last checkpoint (their file may since have changed or gone), or, with no
+            # manifest, a legacy DB without stable chunk IDs. A resumed file rewrites its own.
+            recorded_ids = set(self._manifest_chunk_ids(manifest))
+            orphan_ids = [cid for cid in self.vectorstore.get(include=[])["ids"] if cid not in recorded_ids]
+            if orphan_ids:
+                logger.info(f"Removing {len(orphan_ids)} chunks not recorded in the manifest...")
+                self.vectorstore.delete(ids=orphan_ids)
+            
+            # Diff the knowledge base against the manifest
+            logger.info(f"Scanning documents in {KNOWLEDGE_BASE_DIR}...")
+            current = {rel_path: file_sha256(KNOWLEDGE_BASE_DIR / rel_path) for rel_path in scan_knowledge_base()}
+            if not current:
+                logger.warning(f"No documents found in {KNOWLEDGE_BASE_DIR}! Make sure the path is correct.")
+            
+            removed = [p for p in manifest["files"] if p not in current]
+            changed = [p for p in current if p in manifest["files"] and manifest["files"][p]["sha256"] != current[p]]
+            added = [p for p in current if p not in manifest["files"]]
+            changed = self._with_dependent_files(manifest, removed, changed)
+            # Partly stored files resume where their checkpoint stopped, unless they changed since
+            resume = {p: entry for p, entry in manifest["partial"].items() if current.get(p) == entry["sha256"] and p in added}
+            stale_partial = [p for p in manifest["partial"] if p not in resume]
+            logger.info(
+                f"Knowledge base diff: {len(added)} added, {len(changed)} changed, {len(removed)} removed"
+                + (f", resuming {len(resume)} partly indexed" if resume else "")
             )
             
-            # Check if Chroma DB already exists
-            if CHROMA_DB_DIR.exists() and any(CHROMA_DB_DIR.iterdir()):
-                logger.info("Loading existing Chroma DB...")
-                self.vectorstore = Chroma(
-                    persist_directory=str(CHROMA_DB_DIR),
-                    embedding_function=self.embeddings
-                )
+            if not (added or changed or removed or stale_partial):
+                if isinstance(self.vectorstore, MmapVectorStore):
+                    self.vectorstore.flush()
+                self._sync_lexical_index(manifest)
+                self._load_provenance(manifest)
                 logger.info("RAG system loaded from existing database")
                 return
             
-            # Load documents from knowledge base
-            logger.info(f"Loading documents from {KNOWLEDGE_BASE_DIR}...")
+            # Drop chunks of deleted and edited files, and of partly stored files that changed
+            stale_ids = [cid for p in removed + changed for cid in manifest["files"][p]["chunk_ids"]]
+            stale_ids += [cid for p in stale_partial for cid in manifest["partial"][p]["chunk_ids"]]
+            if stale_ids:
+                logger.info(f"Removing {len(stale_ids)} stale chunks...")
+                self.vectorstore.delete(ids=stale_ids)
+                for chunk_id in stale_ids:
+                    self.lexical_index.remove(chunk_id)
+            for p in removed:
+                del manifest["files"][p]
+            for p in stale_partial:
+                del manifest["partial"][p]
             
-            # Load text files
-            txt_loader = DirectoryLoader(
-                str(KNOWLEDGE_BASE_DIR),
-                glob="**/*.txt",
-                loader_cls=TextLoader,
-                loader_kwargs={'autodetect_encoding': True}
-            )
-            txt_docs = txt_loader.load()
-            logger.info(f"Loaded {len(txt_docs)} text documents")
+            # Parse, split, embed and store the new content
+            def on_file_indexed(rel_path, chunk_ids, duplicates):
+                manifest["files"][rel_path] = {"sha256": current[rel_path], "chunk_ids": chunk_ids, "duplicates": duplicates}
+                manifest["partial"].pop(rel_path, None)
+                # Persist as files complete so an interrupted run keeps its progress
+                save_manifest(manifest)
             
-            # Load PDF files
-            pdf_loader = DirectoryLoader(
-                str(KNOWLEDGE_BASE_DIR),
-                glob="**/*.pdf",
-                loader_cls=PyPDFLoader
-            )
-            pdf_docs = pdf_loader.load()
-            logger.info(f"Loaded {len(pdf_docs)} PDF documents")
-            
-            # Combine all documents
-            all_docs = txt_docs + pdf_docs
+            def on_checkpoint(rel_path, progress):
+                manifest["partial"][rel_path] = {"sha256": current[rel_path], **progress}
+                save_manifest(manifest)
             
-            if not all_docs:
-                logger.warning(f"No documents found in {KNOWLEDGE_BASE_DIR}! Make sure the path is correct.")
-                return
+            deduplicator = None
+            if INGEST_DEDUP:
+                # New chunks are compared against everything already stored, not just each
+                # other; stored text is read back a batch at a time
+                deduplicator = ChunkDeduplicator()
+                existing_ids = self.vectorstore.get(include=[])["ids"]
+                for start in range(0, len(existing_ids), STORE_BATCH_SIZE):
+                    batch = self.vectorstore.get(ids=existing_ids[start:start + STORE_BATCH_SIZE], include=["documents"])
+                    deduplicator.add_many(batch["ids"], batch["documents"])
             
-            # Split documents into chunks
-            logger.info("Splitting documents into chunks...")
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=500,
-                chunk_overlap=50,
-                separators=["\n\n", "\n", ". ", " ", ""]
+            pipeline = IngestionPipeline(
+                self.vectorstore, self.embeddings, lexical_index=self.lexical_index, deduplicator=deduplicator
             )
-            chunks = text_splitter.split_documents(all_docs)
-            logger.info(f"Created {len(chunks)} text chunks")
-            
-            # Create vector store
-            logger.info("Creating Chroma vector store...")
-            self.vectorstore = Chroma.from_documents(
-                documents=chunks,
-                embedding=self.embeddings,
-                persist_directory=str(CHROMA_DB_DIR)
+            pipeline.run(
+                KNOWLEDGE_BASE_DIR, {p: current[p] for p in changed + added}, on_file_indexed,
+                resume=resume, on_checkpoint=on_checkpoint
             )
             
+            if isinstance(self.vectorstore, MmapVectorStore):
+                self.vectorstore.flush()
+            save_manifest(manifest)
+            self._sync_lexical_index(manifest, force_save=True)
+            self._load_provenance(manifest)
             logger.info("RAG system setup complete!")
             
         except Exception as e:
-            logger.error(f"Error setting up RAG system: {str(e)}")
+            logger.error(f"Error building RAG index: {str(e)}")
             raise
     
-    def query(self, query_text: str, k: int = 3) -> str:
-        """Query the RAG system and return relevant context"""
+    @staticmethod
+    def _manifest_chunk_ids(manifest: dict) -> list:
+        """IDs of every stored chunk the manifest knows of, from complete and partly indexed files."""
+        entries = list(manifest["files"].values()) + list(manifest["partial"].values())
+        return [cid for entry in entries for cid in entry["chunk_ids"]]
+    
+    @staticmethod
+    def _with_dependent_files(manifest: dict, removed: list, changed: list) -> list:
+        """`changed` plus every unchanged file whose dropped duplicate chunks point at chunks
+        that are about to be deleted; re-indexing them keeps their text in the store."""
+        reindex = set(changed)
+        while True:
+            stale = {cid for p in removed + list(reindex) for cid in manifest["files"][p]["chunk_ids"]}
+            dependents = {
+                p for p, entry in manifest["files"].items()
+                if p not in reindex and p not in removed
+                and any(canonical in stale for canonical in entry.get("duplicates", {}).values())
+            }
+            if not dependents:
+                return [p for p in manifest["files"] if p in reindex]
+            reindex |= dependents
+    
+    def _load_provenance(self, manifest: dict):
+        self.duplicate_sources = {}
+        for rel_path, entry in manifest["files"].items():
+            for canonical in entry.get("duplicates", {}).values():
+                self.duplicate_sources.setdefault(canonical, set()).add(rel_path)
+        total = sum(len(entry.get("duplicates", {})) for entry in manifest["files"].values())
+        if total:
+            logger.info(f"Index omits {total} duplicate chunks; their text is served from {len(self.duplicate_sources)} stored chunks")
+    
+    def chunk_sources(self, chunk_id: str) -> list:
+        """Every knowledge base file containing a stored chunk's text, its own file first."""
+        own = chunk_id.split("::", 1)[0]
+        return [own] + sorted(self.duplicate_sources.get(chunk_id, set()) - {own})
+    
+    def _sync_lexical_index(self, manifest: dict, force_save: bool = False):
+        """Make the BM25 index hold exactly the chunks in the manifest.
+
+        The index is saved once per setup rather than per file, so after an interrupted
+        build it can lag the vector store; missing chunks are read back from Chroma.
+        """
+        indexed_ids = set(self._manifest_chunk_ids(manifest))
+        extra = [cid for cid in self.lexical_index.chunks if cid not in indexed_ids]
+        missing = [cid for cid in indexed_ids if cid not in self.lexical_index]
+        for chunk_id in extra:
+            self.lexical_index.remove(chunk_id)
+        for start in range(0, len(missing), STORE_BATCH_SIZE):
+            batch = self.vectorstore.get(ids=missing[start:start + STORE_BATCH_SIZE], include=["documents", "metadatas"])
+            self.lexical_index.add_many(batch["ids"], batch["documents"], batch["metadatas"])
+        if extra or missing:
+            logger.info(f"BM25 index resynced: {len(missing)} chunks added, {len(extra)} removed")
+        if extra or missing or force_save or not BM25_INDEX_PATH.exists():
+            self.lexical_index.save(BM25_INDEX_PATH)
+    
+    def retrieve(self, query_text: str, k: int = 3) -> list:
+        """Return the top-k chunk Documents for a query (each carries its `chunk_id` metadata).
+
+        In hybrid mode a short keyword query ("dengue") whose terms are rare and present in
+        every top BM25 hit is answered from the BM25 index alone, skipping the embedding
+        and vector search. Anything else runs both searches and fuses them by rank.
+        """
+        if RETRIEVAL_MODE != "hybrid" or not self.lexical_index:
+            self.retrieval_stats["vector"] += 1
+            return self._vector_search(query_text, k)
+        
+        lexical = self.lexical_index.search(query_text, k=max(k, HYBRID_CANDIDATES))
+        if self.lexical_index.is_decisive(query_text, lexical, k, BM25_FASTPATH_MIN_IDF, BM25_FASTPATH_MAX_TERMS):
+            self.retrieval_stats["lexical"] += 1
+            return [self._lexical_document(chunk_id) for chunk_id, _ in lexical[:k]]
+        
+        self.retrieval_stats["hybrid"] += 1
+        vector_docs = self._vector_search(query_text, max(k, HYBRID_CANDIDATES))
+        docs_by_id = {doc.metadata.get("chunk_id", ""): doc for doc in vector_docs}
+        fused = reciprocal_rank_fusion([[chunk_id for chunk_id, _ in lexical], list(docs_by_id)])
+        return [docs_by_id.get(chunk_id) or self._lexical_document(chunk_id) for chunk_id in fused[:k]]
+    
+    def _lexical_document(self, chunk_id: str) -> Document:
+        text, metadata = self.lexical_index.chunks[chunk_id]
+        return Document(page_content=text, metadata=metadata)
+    
+    def _vector_search(self, query_text: str, k: int) -> list:
         # --- DEFENSIVE CHECK MODIFIED FOR RELOAD ---
         if not self.vectorstore:
              # Try loading the database if it exists but wasn't fully initialized during setup
             if CHROMA_DB_DIR.exists() and any(CHROMA_DB_DIR.iterdir()):
-                logger.info("Vectorstore was None, attempting to reload Chroma DB for query...")
+                logger.info("Vectorstore was None, attempting to reload vector store for query...")
                 try:
-                    self.vectorstore = Chroma(
-                        persist_directory=str(CHROMA_DB_DIR),
-                        embedding_function=self.embeddings
-                    )
+                    self.vectorstore = open_vectorstore(self.query_embeddings)
                 except Exception as load_error:
                     logger.error(f"Failed to load vectorstore on query attempt: {str(load_error)}")
-                    return ""
+                    return []
             else:
                 logger.warning("Query attempted but vectorstore is not available and database is empty.")
-                return ""
+                return []
         # --- END DEFENSIVE CHECK ---
         
         try:
             # The multilingual model handles the cross-lingual search automatically
-            docs = self.vectorstore.similarity_search(query_text, k=k)
-            context = "\n\n".join([doc.page_content for doc in docs])
-            return context
+            return self.vectorstore.similarity_search(query_text, k=k)
         except Exception as e:
             logger.error(f"Error querying RAG system: {str(e)}")
-            return ""
+            return []
+    
+    def query_with_ids(self, query_text: str, k: int = 3) -> tuple:
+        """Query the RAG system and return (context, chunk_ids) for the retrieved chunks"""
+        docs = self.retrieve(query_text, k=k)
+        context = "\n\n".join([doc.page_content for doc in docs])
+        chunk_ids = [doc.metadata.get("chunk_id", "") for doc in docs]
+        return context, chunk_ids
+    
+    def query(self, query_text: str, k: int = 3) -> str:
+        """Query the RAG system and return relevant context"""
+        context, _ = self.query_with_ids(query_text, k=k)
+        return context
 
 # Global RAG instance
 rag_system = RAGSystem()
@@ -0,0 +1,70 @@
+"""Resident memory per API worker and retrieval sidecar (Linux).
+
+Usage (from backend/):
+    python report_memory.py                          # processes running auth:app or rag_service.py
+    python report_memory.py --match "gunicorn|uvicorn" --output memory.json
+
+rss counts every page a process has mapped, including pages shared with other workers;
+pss splits shared pages between their users (the pss column sums to the real total);
+uss is memory only that process uses. Compare RAG_MODE=local with RAG_MODE=service at
+the same worker count: in service mode each worker's uss should drop by about the model
+and index size, paid once by the sidecar instead.
+"""
+import os
+import re
+import sys
+import json
+import argparse
+from pathlib import Path
+
+from metrics import memory_usage
+
+DEFAULT_MATCH = r"auth:app|rag_service\.py"
+MB = 1024 * 1024
+
+
+def find_processes(pattern: str) -> list:
+    """(pid, command line) of every process whose command line matches `pattern`."""
+    regex = re.compile(pattern)
+    processes = []
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit() or int(entry.name) == os.getpid():
+            continue
+        try:
+            cmdline = (entry / "cmdline").read_bytes().replace(b"\0", b" ").decode(errors="replace").strip()
+        except OSError:
+            continue
+        if cmdline and regex.search(cmdline):
+            processes.append((int(entry.name), cmdline))
+    return sorted(processes)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--match", default=DEFAULT_MATCH, help="regex over process command lines")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    rows = []
+    for pid, cmdline in find_processes(args.match):
+        usage = memory_usage(pid)
+        if usage:
+            role = "rag_service" if "rag_service" in cmdline else "worker"
+            rows.append({"pid": pid, "role": role, "cmdline": cmdline[:120], **usage})
+    if not rows:
+        print(f"No processes match {args.match!r}")
+        return 1
+
+    print(f"{'pid':>8} {'role':12} {'rss MB':>9} {'pss MB':>9} {'uss MB':>9}")
+    for row in rows:
+        print(f"{row['pid']:>8} {row['role']:12} {row['rss'] / MB:>9.1f} {row['pss'] / MB:>9.1f} {row['uss'] / MB:>9.1f}")
+    totals = {kind: sum(row[kind] for row in rows) for kind in ("rss", "pss", "uss")}
+    print(f"{'total':>8} {'':12} {totals['rss'] / MB:>9.1f} {totals['pss'] / MB:>9.1f} {totals['uss'] / MB:>9.1f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"processes": rows, "total": totals}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,6 +6,9 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlmodel import Session, select
 from models import Worker, get_session
+from auth_cache import (
+    get_verified_username, cache_verified_token, get_cached_worker, cache_worker, register_worker_model
+)
 import os  # <-- ADDED
 from dotenv import load_dotenv  # <-- ADDED
 
@@ -22,6 +25,9 @@ if not SECRET_KEY:
     raise ValueError("FATAL ERROR: SECRET_KEY environment variable not set.")
 # --- MODIFIED SECTION END ---
 
+# Drop cached tokens/worker rows when a worker is changed or removed
+register_worker_model(Worker)
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
@@ -50,16 +56,23 @@ def get_current_worker(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+    token = credentials.credentials
+    # A token seen before already passed the signature and expiry checks
+    username = get_verified_username(token)
+    if username is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            username: str = payload.get("sub")
+            if username is None:
+                raise credentials_exception
+        except JWTError:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+        cache_verified_token(token, payload)
     
-    worker = session.exec(select(Worker).where(Worker.username == username)).first()
+    worker = get_cached_worker(username)
     if worker is None:
-        raise credentials_exception
+        worker = session.exec(select(Worker).where(Worker.username == username)).first()
+        if worker is None:
+            raise credentials_exception
+        cache_worker(worker)
     return worker
\ No newline at end of file
@@ -28,10 +28,25 @@ const Chat = () => {
       return;
     }
     setLanguage(savedLanguage);
-    fetchAlerts();
     loadWelcomeMessage(savedLanguage);
   }, [navigate]);
 
+  // Alerts are pushed by the server; EventSource reconnects on its own and
+  // resumes after the last alert it saw (Last-Event-ID).
+  useEffect(() => {
+    if (!('EventSource' in window)) {
+      fetchAlerts();
+      return;
+    }
+    const source = new EventSource('/api/alerts/stream');
+    source.addEventListener('alert', (event) => {
+      const alert = JSON.parse(event.data);
+      setAlerts(prev => prev.some(a => a.id === alert.id) ? prev : [alert, ...prev]);
+    });
+    source.addEventListener('clear', () => setAlerts([]));
+    return () => source.close();
+  }, []);
+
   useEffect(() => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   }, [messages]);
@@ -59,6 +74,44 @@ const Chat = () => {
     }
   };
 
+  // Reads the /api/chat/stream Server-Sent Events and calls onToken for each text chunk.
+  // Resolves with the full answer once the "done" event arrives.
+  const streamChat = async (query, onToken) => {
+    const response = await fetch('/api/chat/stream', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ query, language })
+    });
+    if (!response.ok || !response.body) {
+      throw new Error(`Stream request failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // Events are separated by a blank line
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const rawEvent = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        const eventLine = rawEvent.split('\n').find(line => line.startsWith('event: '));
+        const dataLine = rawEvent.split('\n').find(line => line.startsWith('data: '));
+        if (!eventLine || !dataLine) continue;
+        const eventName = eventLine.slice(7);
+        const data = JSON.parse(dataLine.slice(6));
+        if (eventName === 'token') onToken(data.text);
+        if (eventName === 'done') return data.response;
+        if (eventName === 'error') throw new Error(data.detail);
+      }
+    }
+    throw new Error('Stream ended before the answer was complete');
+  };
+
   const handleSendMessage = async () => {
     if (!inputText.trim() || isLoading) return;
 
@@ -67,22 +120,50 @@ const Chat = () => {
     setMessages(prev => [...prev, { type: 'user', text: userMessage }]);
     setIsLoading(true);
 
+    // Replace the text of the bot message we are streaming into (always the last one)
+    const setStreamingText = (text) => {
+      setMessages(prev => [...prev.slice(0, -1), { type: 'bot', text }]);
+    };
+
+    let streamStarted = false;
     try {
-      // UPDATED URL: Changed to relative path
-      const response = await axios.post('/api/chat', {
-        query: userMessage,
-        language: language
+      let partial = '';
+      const answer = await streamChat(userMessage, (token) => {
+        if (!streamStarted) {
+          // First token: swap the typing indicator for the message bubble
+          streamStarted = true;
+          setIsLoading(false);
+          setMessages(prev => [...prev, { type: 'bot', text: '' }]);
+        }
+        partial += token;
+        setStreamingText(partial);
       });
+      if (streamStarted) {
+        setStreamingText(answer);
+      } else {
+        setMessages(prev => [...prev, { type: 'bot', text: answer }]);
+      }
+    } catch (streamError) {
+      console.error('Streaming failed, falling back to /api/chat:', streamError);
+      try {
+        // UPDATED URL: Changed to relative path
+        const response = await axios.post('/api/chat', {
+          query: userMessage,
+          language: language
+        });
 
-      setMessages(prev => [...prev, { type: 'bot', text: response.data.response }]);
-    } catch (error) {
-      console.error('Error sending message:', error);
-      setMessages(prev => [...prev, { 
-        type: 'bot', 
-        text: language === 'hi' ? 'क्षमा करें, कोई त्रुटि हुई।' : 
-              language === 'kn' ? 'ಕ್ಷಮಿಸಿ, ತಪ್ಪು ಆಗಿದೆ.' : 
-              'Sorry, an error occurred.' 
-      }]);
+        const botMessage = { type: 'bot', text: response.data.response };
+        setMessages(prev => streamStarted ? [...prev.slice(0, -1), botMessage] : [...prev, botMessage]);
+      } catch (error) {
+        console.error('Error sending message:', error);
+        const errorMessage = { 
+          type: 'bot', 
+          text: language === 'hi' ? 'क्षमा करें, कोई त्रुटि हुई।' : 
+                language === 'kn' ? 'ಕ್ಷಮಿಸಿ, ತಪ್ಪು ಆಗಿದೆ.' : 
+                'Sorry, an error occurred.' 
+        };
+        setMessages(prev => streamStarted ? [...prev.slice(0, -1), errorMessage] : [...prev, errorMessage]);
+      }
     } finally {
       setIsLoading(false);
     }
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Button } from './ui/button';
 import { Input } from './ui/input';
@@ -13,6 +13,10 @@ import axios from 'axios';
 // REMOVED THE BACKEND_URL AND API CONSTANTS
 // The proxy in package.json will handle requests to /api/*
 
+// How often the inventory list checks for changes. Each check downloads only the rows
+// changed since the version we hold (nothing at all when the inventory is unchanged).
+const INVENTORY_POLL_MS = 15000;
+
 const Dashboard = () => {
   const navigate = useNavigate();
   const [alertMessage, setAlertMessage] = useState('');
@@ -20,9 +24,13 @@ const Dashboard = () => {
   const [newItemName, setNewItemName] = useState('');
   const [newItemQuantity, setNewItemQuantity] = useState('');
   const [isLoading, setIsLoading] = useState(false);
+  // Inventory version the list reflects (0 = nothing loaded yet)
+  const inventoryVersion = useRef(0);
 
   useEffect(() => {
     fetchInventory();
+    const interval = setInterval(fetchInventory, INVENTORY_POLL_MS);
+    return () => clearInterval(interval);
   }, []);
 
   const getAuthHeaders = () => {
@@ -41,11 +49,22 @@ const Dashboard = () => {
 
   const fetchInventory = async () => {
     try {
-      // UPDATED URL: Changed to relative path
-      const response = await axios.get('/api/worker/get-inventory', {
+      // Delta sync: only rows written after the version we already have
+      const response = await axios.get('/api/worker/inventory-changes', {
+        params: { since: inventoryVersion.current },
         headers: getAuthHeaders()
       });
-      setInventory(response.data);
+      const { version, full, items } = response.data;
+      if (full) {
+        setInventory(items);
+      } else if (items.length > 0) {
+        setInventory((current) => {
+          const byId = new Map(current.map((item) => [item.id, item]));
+          items.forEach((item) => byId.set(item.id, item));
+          return Array.from(byId.values());
+        });
+      }
+      inventoryVersion.current = version;
     } catch (error) {
       console.error('Error fetching inventory:', error);
       if (error.response?.status === 401) {
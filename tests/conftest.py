@@ -0,0 +1,44 @@
+"""Run from the repository root with backend/requirements.txt installed: python -m pytest tests"""
+import os
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).parent.parent / "backend"
+WORK_DIR = Path(tempfile.mkdtemp(prefix="aacharya_tests_"))
+
+# Must be set before the backend modules read their configuration at import time:
+# no model downloads, no Gemini calls, and nothing written next to the real database
+os.environ.update({
+    "EMBEDDING_BACKEND": "hashed",
+    "LLM_BACKEND": "fake",
+    "VECTOR_STORE": "mmap",
+    "INGEST_WORKERS": "1",
+    "DATABASE_PATH": str(WORK_DIR / "test.db"),
+    "CHROMA_DB_DIR": str(WORK_DIR / "index"),
+    "TRANSLATION_CACHE_PATH": str(WORK_DIR / "translation_cache.db"),
+})
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+@pytest.fixture(scope="session")
+def client():
+    """The app with its lifespan run, once the background RAG warm-up has finished."""
+    from fastapi.testclient import TestClient
+    import auth
+
+    with TestClient(auth.app) as test_client:
+        deadline = time.monotonic() + 300
+        while not auth.rag_ready():
+            assert time.monotonic() < deadline, "RAG index did not become ready"
+            time.sleep(0.1)
+        yield test_client
+
+@pytest.fixture(scope="session")
+def auth_headers(client):
+    response = client.post("/api/worker/login", json={"username": "healthworker", "password": "securepass"})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
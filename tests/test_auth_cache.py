@@ -0,0 +1,46 @@
+import sqlite3
+
+from sqlmodel import Session, select
+
+import auth
+from auth_cache import worker_cache
+from database import DB_PATH
+
+
+def create_worker(username: str, password: str = "pass1234"):
+    with Session(auth.engine) as session:
+        session.add(auth.Worker(username=username, hashed_password=auth.get_password_hash(password)))
+        session.commit()
+
+def login(client, username: str, password: str = "pass1234") -> dict:
+    response = client.post("/api/worker/login", json={"username": username, "password": password})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def inventory_status(client, headers: dict) -> int:
+    return client.get("/api/worker/get-inventory", headers=headers).status_code
+
+
+def test_orm_delete_revokes_cached_worker(client):
+    create_worker("cache-orm")
+    headers = login(client, "cache-orm")
+    assert inventory_status(client, headers) == 200
+
+    with Session(auth.engine) as session:
+        session.delete(session.exec(select(auth.Worker).where(auth.Worker.username == "cache-orm")).one())
+        session.commit()
+    assert inventory_status(client, headers) == 401
+
+def test_out_of_process_delete_is_seen_after_worker_ttl(client):
+    create_worker("cache-external")
+    headers = login(client, "cache-external")
+    assert inventory_status(client, headers) == 200
+
+    # Another process (a second worker, seed_db.py, a SQL shell) removes the row
+    with sqlite3.connect(DB_PATH) as connection:
+        connection.execute("DELETE FROM worker WHERE username = 'cache-external'")
+    # Within WORKER_CACHE_TTL_SECONDS the cached row still authenticates...
+    assert inventory_status(client, headers) == 200
+    # ...and once it expires the row is read again, even though the token is still cached
+    worker_cache.invalidate_where(lambda key: key == "cache-external")
+    assert inventory_status(client, headers) == 401
@@ -0,0 +1,67 @@
+def inventory(client, auth_headers) -> dict:
+    items = client.get("/api/worker/get-inventory", headers=auth_headers).json()
+    return {item["item_name"]: item["quantity"] for item in items}
+
+
+def test_json_import_reports_each_row(client, auth_headers):
+    body = [
+        {"item_name": "Bulk Gauze", "quantity": 40},
+        {"item_name": "Paracetamol", "quantity": 300},
+        {"item_name": "", "quantity": 5},
+        {"item_name": "Bulk Syringes", "quantity": -1},
+        "not an object",
+    ]
+    response = client.post("/api/worker/bulk-update-inventory", json=body, headers=auth_headers)
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["status"], result["created"], result["updated"], result["errors"]) == ("partial", 1, 1, 3)
+    assert [(r["row"], r["status"]) for r in result["results"]] == [
+        (1, "created"), (2, "updated"), (3, "error"), (4, "error"), (5, "error")
+    ]
+    assert result["results"][3]["error"] == "quantity must be a non-negative integer"
+
+    stock = inventory(client, auth_headers)
+    assert stock["Bulk Gauze"] == 40 and stock["Paracetamol"] == 300
+    assert "Bulk Syringes" not in stock
+
+def test_csv_import_streams_rows(client, auth_headers):
+    body = 'item_name,quantity\n"Bulk Masks, N95",120\nBulk Gloves,80\nBulk Gloves,85\nBulk Swabs,lots\n'
+    response = client.post("/api/worker/bulk-update-inventory", content=body.encode(),
+                           headers={**auth_headers, "Content-Type": "text/csv"})
+    result = response.json()
+    assert (result["created"], result["updated"], result["errors"]) == (2, 1, 1)
+    # Row numbers count CSV records, header included
+    assert [(r["row"], r["status"]) for r in result["results"]] == [
+        (2, "created"), (3, "created"), (4, "updated"), (5, "error")
+    ]
+    stock = inventory(client, auth_headers)
+    assert stock["Bulk Masks, N95"] == 120
+    # A name repeated in the file ends up with its last quantity
+    assert stock["Bulk Gloves"] == 85
+
+def test_multipart_csv_upload(client, auth_headers):
+    files = {"file": ("stock.csv", b"item_name,quantity\nBulk Splints,12\n", "text/csv")}
+    response = client.post("/api/worker/bulk-update-inventory", files=files, headers=auth_headers)
+    assert response.json()["status"] == "success"
+    assert inventory(client, auth_headers)["Bulk Splints"] == 12
+
+def test_atomic_import_rejects_everything_on_any_error(client, auth_headers):
+    body = [{"item_name": "Bulk Atomic", "quantity": 1}, {"item_name": "Bulk Atomic 2", "quantity": "x"}]
+    response = client.post("/api/worker/bulk-update-inventory", params={"atomic": True}, json=body, headers=auth_headers)
+    result = response.json()
+    assert (result["status"], result["created"], result["errors"]) == ("rejected", 0, 1)
+    assert "Bulk Atomic" not in inventory(client, auth_headers)
+
+def test_import_bumps_inventory_version_once(client, auth_headers):
+    since = client.get("/api/worker/inventory-changes", headers=auth_headers).json()["version"]
+    body = [{"item_name": "Bulk Version A", "quantity": 1}, {"item_name": "Bulk Version B", "quantity": 2}]
+    client.post("/api/worker/bulk-update-inventory", json=body, headers=auth_headers)
+
+    delta = client.get("/api/worker/inventory-changes", params={"since": since}, headers=auth_headers).json()
+    assert delta["version"] == since + 1
+    assert sorted(item["item_name"] for item in delta["items"]) == ["Bulk Version A", "Bulk Version B"]
+
+def test_malformed_json_is_rejected(client, auth_headers):
+    response = client.post("/api/worker/bulk-update-inventory", content=b"{not json",
+                           headers={**auth_headers, "Content-Type": "application/json"})
+    assert response.status_code == 400
@@ -0,0 +1,29 @@
+from cache import LRUTTLCache, PersistentLRUCache
+
+
+def test_persistent_cache_opens_its_file_on_first_use(tmp_path):
+    path = tmp_path / "translation_cache.db"
+    cache = PersistentLRUCache(path, maxsize=2)
+    assert not path.exists()
+
+    cache.set("namaste", "hello")
+    assert path.exists()
+    assert PersistentLRUCache(path, maxsize=2).get("namaste") == "hello"
+
+def test_persistent_cache_keeps_most_recent_entries(tmp_path):
+    path = tmp_path / "translation_cache.db"
+    cache = PersistentLRUCache(path, maxsize=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key.upper())
+
+    reloaded = PersistentLRUCache(path, maxsize=2)
+    assert reloaded.get("a") is None
+    assert (reloaded.get("b"), reloaded.get("c")) == ("B", "C")
+
+def test_lru_ttl_cache_invalidates_by_tag():
+    cache = LRUTTLCache(maxsize=10, ttl=60)
+    cache.set("q1", "answer 1", tags=("inventory",))
+    cache.set("q2", "answer 2")
+    assert cache.invalidate_tag("inventory") == 1
+    assert cache.get("q1") is None
+    assert cache.get("q2") == "answer 2"
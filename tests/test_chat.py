@@ -0,0 +1,40 @@
+import pytest
+
+from llm_gateway import FakeLLMBackend, llm_gateway
+
+
+@pytest.fixture
+def echo_llm():
+    """The fake LLM answering with the whole prompt, so tests can see what it was given."""
+    previous = llm_gateway.backend
+    backend = FakeLLMBackend(responder=lambda prompt: prompt)
+    llm_gateway.set_backend(backend)
+    yield backend
+    llm_gateway.set_backend(previous)
+
+def ask(client, query: str) -> str:
+    response = client.post("/api/chat", json={"query": query, "language": "en"})
+    assert response.status_code == 200
+    return response.json()["response"]
+
+
+def test_chat_answers_from_knowledge_base(client, echo_llm):
+    prompt = ask(client, "What are the symptoms of dengue fever?")
+    assert echo_llm.calls == 1
+    assert "dengue" in prompt.lower()
+
+def test_repeated_question_is_served_from_answer_cache(client, echo_llm):
+    first = ask(client, "How is cholera treated?")
+    second = ask(client, "How is cholera treated?")
+    assert first == second
+    assert echo_llm.calls == 1
+
+def test_inventory_update_invalidates_cached_answers(client, auth_headers, echo_llm):
+    client.post("/api/worker/update-inventory", json={"item_name": "Thermometers", "quantity": 31}, headers=auth_headers)
+    before = ask(client, "Do we have Thermometers in stock?")
+    assert "31" in before
+
+    client.post("/api/worker/update-inventory", json={"item_name": "Thermometers", "quantity": 64}, headers=auth_headers)
+    after = ask(client, "Do we have Thermometers in stock?")
+    assert echo_llm.calls == 2
+    assert "64" in after and "31" not in after
@@ -0,0 +1,136 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+import rag_setup
+from rag_setup import RAGSystem, load_manifest
+
+KNOWLEDGE_BASE = Path(__file__).parent.parent / "knowledge_base"
+FILES = ["Dengue.txt", "Malaria.txt", "Cholera.txt"]
+
+
+@pytest.fixture(params=["mmap", "chroma"])
+def kb_dir(request, tmp_path, monkeypatch):
+    """A small knowledge base and an empty index directory, for each vector store."""
+    kb_dir = tmp_path / "kb"
+    kb_dir.mkdir()
+    for name in FILES:
+        shutil.copy(KNOWLEDGE_BASE / name, kb_dir / name)
+    index_dir = tmp_path / "index"
+    monkeypatch.setattr(rag_setup, "VECTOR_STORE", request.param)
+    monkeypatch.setattr(rag_setup, "KNOWLEDGE_BASE_DIR", kb_dir)
+    monkeypatch.setattr(rag_setup, "CHROMA_DB_DIR", index_dir)
+    monkeypatch.setattr(rag_setup, "MANIFEST_PATH", index_dir / "kb_manifest.json")
+    monkeypatch.setattr(rag_setup, "BM25_INDEX_PATH", index_dir / "bm25_index.json")
+    return kb_dir
+
+def build() -> tuple:
+    system = RAGSystem()
+    system.setup()
+    return system, load_manifest()
+
+def stored_ids(system) -> set:
+    return set(system.vectorstore.get(include=[])["ids"])
+
+def assert_store_matches_manifest(system, manifest):
+    """Every stored chunk is on record and every recorded duplicate points at a stored chunk."""
+    assert stored_ids(system) == set(RAGSystem._manifest_chunk_ids(manifest))
+    for entry in manifest["files"].values():
+        assert set(entry["duplicates"].values()) <= stored_ids(system)
+
+
+def test_unchanged_rebuild_reuses_index(kb_dir):
+    system, manifest = build()
+    assert set(manifest["files"]) == set(FILES)
+    assert_store_matches_manifest(system, manifest)
+
+    rebuilt, rebuilt_manifest = build()
+    assert rebuilt_manifest["files"] == manifest["files"]
+    assert stored_ids(rebuilt) == stored_ids(system)
+
+def test_edited_file_is_reindexed(kb_dir):
+    _, manifest = build()
+    before = manifest["files"]["Dengue.txt"]
+    with open(kb_dir / "Dengue.txt", "a", encoding="utf-8") as f:
+        f.write("\nDengue fever cases rise during the monsoon season.\n")
+
+    system, manifest = build()
+    after = manifest["files"]["Dengue.txt"]
+    assert after["sha256"] != before["sha256"]
+    # The edited file's chunks must not be deduplicated against its own deleted old chunks
+    assert len(after["chunk_ids"]) >= len(before["chunk_ids"])
+    assert not set(before["chunk_ids"]) & stored_ids(system)
+    assert_store_matches_manifest(system, manifest)
+    docs = system.retrieve("dengue fever monsoon", k=3)
+    assert any(doc.metadata["chunk_id"].startswith("Dengue.txt::") for doc in docs)
+
+def test_removed_file_is_dropped(kb_dir):
+    build()
+    (kb_dir / "Malaria.txt").unlink()
+
+    system, manifest = build()
+    assert "Malaria.txt" not in manifest["files"]
+    assert not any(chunk_id.startswith("Malaria.txt::") for chunk_id in stored_ids(system))
+    assert not any(chunk_id.startswith("Malaria.txt::") for chunk_id in system.lexical_index.chunks)
+    assert_store_matches_manifest(system, manifest)
+
+PDF = "Diagnosis-Treatment-Malaria-2013.pdf"
+
+@pytest.fixture
+def interrupted_pdf_build(kb_dir, monkeypatch):
+    """A build interrupted partway through a PDF, after a checkpoint and some later writes."""
+    import ingest
+    shutil.copy(KNOWLEDGE_BASE / PDF, kb_dir / PDF)
+    monkeypatch.setattr(ingest, "INGEST_PAGES_PER_TASK", 2)
+    monkeypatch.setattr(rag_setup, "IngestionPipeline",
+                        lambda *args, **kwargs: ingest.IngestionPipeline(*args, store_batch_size=7, checkpoint_seconds=0, **kwargs))
+    write = ingest.IngestionPipeline._write
+    calls = []
+
+    def failing_write(self, ids, texts, metadatas):
+        calls.append(len(ids))
+        if len(calls) == 16:
+            raise RuntimeError("interrupted")
+        write(self, ids, texts, metadatas)
+
+    monkeypatch.setattr(ingest.IngestionPipeline, "_write", failing_write)
+    with pytest.raises(RuntimeError):
+        build()
+    monkeypatch.setattr(ingest.IngestionPipeline, "_write", write)
+
+    manifest = load_manifest()
+    assert PDF in manifest["partial"]
+    if rag_setup.VECTOR_STORE == "chroma":
+        # Chroma keeps writes made after the checkpoint, though the manifest does not list
+        # them (the mmap store loses its unflushed writes instead)
+        system = RAGSystem()
+        system.load_embeddings()
+        system.vectorstore = rag_setup.open_vectorstore(system.query_embeddings)
+        assert any(cid.startswith(f"{PDF}::") and cid not in manifest["partial"][PDF]["chunk_ids"]
+                   for cid in stored_ids(system))
+    return kb_dir
+
+def test_interrupted_file_resumes(interrupted_pdf_build):
+    system, manifest = build()
+    assert not manifest["partial"]
+    assert PDF in manifest["files"]
+    assert_store_matches_manifest(system, manifest)
+
+def test_interrupted_file_changed_before_resume(interrupted_pdf_build):
+    old_sha = load_manifest()["partial"][PDF]["sha256"]
+    with open(interrupted_pdf_build / PDF, "ab") as f:
+        f.write(b"\n% edited\n")
+
+    system, manifest = build()
+    assert manifest["files"][PDF]["sha256"] != old_sha
+    assert not any(cid.startswith(f"{PDF}::{old_sha[:16]}::") for cid in stored_ids(system))
+    assert_store_matches_manifest(system, manifest)
+
+def test_interrupted_file_removed_before_resume(interrupted_pdf_build):
+    (interrupted_pdf_build / PDF).unlink()
+
+    system, manifest = build()
+    assert PDF not in manifest["files"] and not manifest["partial"]
+    assert not any(cid.startswith(f"{PDF}::") for cid in stored_ids(system))
+    assert_store_matches_manifest(system, manifest)
@@ -0,0 +1,56 @@
+def test_full_snapshot_from_zero(client, auth_headers):
+    response = client.get("/api/worker/inventory-changes", params={"since": 0}, headers=auth_headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["full"] is True
+    assert body["version"] >= 1
+    names = {item["item_name"] for item in body["items"]}
+    assert {"Paracetamol", "Bandages"} <= names
+    assert all(item["version"] <= body["version"] for item in body["items"])
+
+def test_delta_after_update(client, auth_headers):
+    since = client.get("/api/worker/inventory-changes", headers=auth_headers).json()["version"]
+    update = client.post("/api/worker/update-inventory", json={"item_name": "Paracetamol", "quantity": 77},
+                         headers=auth_headers)
+    assert update.status_code == 200
+
+    response = client.get("/api/worker/inventory-changes", params={"since": since}, headers=auth_headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["full"] is False
+    assert body["version"] == since + 1
+    assert [(item["item_name"], item["quantity"]) for item in body["items"]] == [("Paracetamol", 77)]
+
+    # Nothing written since the latest version: an empty delta
+    latest = client.get("/api/worker/inventory-changes", params={"since": body["version"]}, headers=auth_headers)
+    assert latest.json()["items"] == []
+
+def test_since_ahead_of_server_returns_full_snapshot(client, auth_headers):
+    version = client.get("/api/worker/inventory-changes", headers=auth_headers).json()["version"]
+    body = client.get("/api/worker/inventory-changes", params={"since": version + 100}, headers=auth_headers).json()
+    assert body["full"] is True
+    assert body["items"]
+
+def test_get_inventory_etag_revalidation(client, auth_headers):
+    first = client.get("/api/worker/get-inventory", headers=auth_headers)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    unchanged = client.get("/api/worker/get-inventory", headers={**auth_headers, "If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+
+    client.post("/api/worker/update-inventory", json={"item_name": "Bandages", "quantity": 199}, headers=auth_headers)
+    changed = client.get("/api/worker/get-inventory", headers={**auth_headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert {"item_name": "Bandages", "quantity": 199} in [
+        {"item_name": item["item_name"], "quantity": item["quantity"]} for item in changed.json()
+    ]
+
+def test_inventory_changes_etag_revalidation(client, auth_headers):
+    first = client.get("/api/worker/inventory-changes", params={"since": 0}, headers=auth_headers)
+    etag = first.headers["etag"]
+    revalidated = client.get("/api/worker/inventory-changes", params={"since": 0},
+                             headers={**auth_headers, "If-None-Match": etag})
+    assert revalidated.status_code == 304
@@ -0,0 +1,58 @@
+import time
+import asyncio
+
+import pytest
+
+from llm_gateway import FakeLLMBackend, LLMGateway, LLMTimeoutError
+
+
+class FlakyBackend(FakeLLMBackend):
+    """Raises `error` on the first `failures` calls, then answers like the fake backend."""
+
+    def __init__(self, error: Exception, failures: int = 1, **kwargs):
+        super().__init__(**kwargs)
+        self.error = error
+        self.failures = failures
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        if self.failures:
+            self.failures -= 1
+            self.calls += 1
+            raise self.error
+        return super().generate(prompt, timeout)
+
+
+def make_gateway(backend, **kwargs) -> LLMGateway:
+    gateway = LLMGateway(backend=backend, **kwargs)
+    gateway._backoff = lambda attempt: 0.01
+    return gateway
+
+def test_backend_timeout_is_retried_within_deadline():
+    gateway = make_gateway(FlakyBackend(TimeoutError("read timed out")), timeout=5)
+    assert asyncio.run(gateway.generate("hello")) == "[fake answer] hello"
+    assert gateway.stats["retries"] == 1
+    assert gateway.stats["timeouts"] == 0
+
+def test_backend_timeout_is_retried_in_streams():
+    gateway = make_gateway(FlakyBackend(TimeoutError("read timed out")), timeout=5)
+
+    async def collect():
+        return "".join([chunk async for chunk in gateway.stream("hello")])
+
+    assert asyncio.run(collect()) == "[fake answer] hello"
+    assert gateway.stats["retries"] == 1
+
+def test_deadline_expiry_is_not_retried():
+    # Ignores the timeout it is given, so only the gateway's own deadline can stop it
+    gateway = make_gateway(FakeLLMBackend(responder=lambda prompt: time.sleep(1) or "late"), timeout=0.1)
+    with pytest.raises(LLMTimeoutError):
+        asyncio.run(gateway.generate("slow"))
+    assert gateway.stats["timeouts"] == 1
+    assert gateway.stats["retries"] == 0
+
+def test_non_retryable_error_is_raised():
+    gateway = make_gateway(FlakyBackend(ValueError("bad prompt")), timeout=5)
+    with pytest.raises(ValueError):
+        asyncio.run(gateway.generate("hello"))
+    assert gateway.stats["retries"] == 0
+    assert gateway.stats["failures"] == 1